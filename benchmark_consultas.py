@@ -0,0 +1,127 @@
+"""
+benchmark_consultas.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa que compara el tiempo de las consultas de queries.py sobre todas las categorías cuando se
+ejecutan colección a colección (una tras otra o a la vez en varios hilos), en un único pipeline con
+'$unionWith' y leyendo los recuentos precalculados de rollups.py, y comprueba que todas las formas
+devuelven los mismos resultados.
+Las consultas se ejecutan sin la caché de resultados, para medir siempre la agregación.
+"""
+
+import time
+from pymongo import MongoClient
+import queries as q
+from rollups import review_collection_names, rollups_available
+
+from configuracion import CONNECTION_STRING, database_name_MongoDB, query_threads
+
+# Consultas a comparar: (nombre, función que recibe la base de datos, las colecciones y las opciones)
+BENCHMARK_QUERIES = [
+    ("first_query", q.first_query),
+    ("second_query", lambda database, names, **options: q.second_query(database, names, top_k=None, **options)),
+    ("third_query", q.third_query),
+    ("fifth_query", q.fifth_query),
+    ("seventh_query", q.seventh_query),
+]
+
+
+def time_query(query, database, collection_names, use_union, use_rollups, num_threads=1, repeat=3):
+    """
+    Ejecuta una consulta varias veces y obtiene el mejor tiempo.
+
+    Args:
+        query (function): Función de consulta.
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        collection_names (list): Lista de nombres de colecciones.
+        use_union (bool): Si es True, se usa '$unionWith'.
+        use_rollups (bool): Si es True, se leen los recuentos precalculados.
+        num_threads (int): Colecciones que se consultan a la vez sin '$unionWith'.
+        repeat (int): Número de repeticiones.
+
+    Returns:
+        tuple: Una tupla (segundos, resultado de la última ejecución).
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = query(
+            database,
+            collection_names,
+            use_union=use_union,
+            use_rollups=use_rollups,
+            num_threads=num_threads,
+            use_cache=False,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark_queries(database, collection_names, repeat=3, num_threads=query_threads):
+    """
+    Compara cada consulta colección a colección (una tras otra y en varios hilos), con
+    '$unionWith' y con los recuentos precalculados (si están al día) y muestra los tiempos,
+    junto con el tiempo de cada colección en la ejecución con hilos.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        collection_names (list): Lista de nombres de colecciones.
+        repeat (int): Número de repeticiones de cada medida.
+        num_threads (int): Colecciones que se consultan a la vez en la ejecución con hilos.
+
+    Returns:
+        dict: Diccionario {consulta: (segundos por colección, segundos con hilos, segundos con
+              $unionWith, segundos con los recuentos o None)}.
+    """
+    report = {}
+    with_rollups = rollups_available(database, collection_names)
+
+    for name, query in BENCHMARK_QUERIES:
+        loop_seconds, loop_result = time_query(
+            query, database, collection_names, False, False, repeat=repeat
+        )
+        threads_seconds, threads_result = time_query(
+            query, database, collection_names, False, False, num_threads, repeat
+        )
+        union_seconds, union_result = time_query(
+            query, database, collection_names, True, False, repeat=repeat
+        )
+        results = [threads_result, union_result]
+
+        rollup_seconds = None
+        if with_rollups:
+            rollup_seconds, rollup_result = time_query(
+                query, database, collection_names, True, True, repeat=repeat
+            )
+            results.append(rollup_result)
+
+        # Todas las formas deben dar los mismos recuentos, aunque el orden de las claves cambie
+        same = all(dict(loop_result) == dict(result) for result in results)
+
+        report[name] = (loop_seconds, threads_seconds, union_seconds, rollup_seconds)
+        rollup_text = "" if rollup_seconds is None else f", recuentos {rollup_seconds * 1000:.1f} ms"
+        print(
+            f"{name}: por colección {loop_seconds * 1000:.1f} ms, "
+            f"{num_threads} hilos {threads_seconds * 1000:.1f} ms, "
+            f"$unionWith {union_seconds * 1000:.1f} ms{rollup_text}"
+            f"{'' if same else ' RESULTADOS DISTINTOS'}"
+        )
+        # Solo la ejecución con hilos guarda el tiempo de cada colección
+        q.report_collection_timings()
+
+    return report
+
+
+if __name__ == "__main__":
+
+    client = MongoClient(CONNECTION_STRING)
+    with client:
+        database = client[database_name_MongoDB]
+        benchmark_queries(database, review_collection_names(database))
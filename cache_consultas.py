@@ -0,0 +1,213 @@
+"""
+cache_consultas.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Caché de los resultados de las consultas de queries.py, para que abrir dos veces la misma gráfica
+del menú no repita la agregación en MongoDB. Los resultados se guardan en memoria, con un tamaño
+máximo y descartando primero los menos usados, y opcionalmente también en un fichero en disco que
+se conserva entre ejecuciones.
+
+Cada colección tiene un número de generación en la colección 'query_generations', que los
+programas de carga incrementan cada vez que escriben un lote en ella, y una época que se fija al
+crear su documento. Un resultado guardado solo se usa si las épocas y generaciones de sus
+colecciones no han cambiado desde que se calculó. La época distingue una base de datos borrada y
+vuelta a cargar, en la que las generaciones empiezan otra vez desde 0 y pueden repetirse.
+"""
+
+import copy
+import shelve
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from bson import ObjectId
+
+from configuracion import query_cache_size, query_cache_path
+
+# Colección con la generación de cada colección de reviews
+GENERATIONS_COLLECTION = "query_generations"
+
+
+def bump_generation(collection):
+    """
+    Incrementa la generación de una colección, de forma que los resultados guardados que la
+    usan dejan de ser válidos. Los programas de carga la llaman después de escribir cada lote.
+    La primera vez se crea también la época de la colección.
+
+    Args:
+        collection (pymongo.collection.Collection): Colección en la que se ha escrito.
+
+    Returns:
+        None
+    """
+    collection.database[GENERATIONS_COLLECTION].update_one(
+        {"_id": collection.name},
+        {"$inc": {"generation": 1}, "$setOnInsert": {"epoch": ObjectId()}},
+        upsert=True,
+    )
+
+def collection_generations(database, collection_names):
+    """
+    Obtiene la época y la generación actuales de varias colecciones con una sola consulta.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        collection_names (list): Lista de nombres de colecciones.
+
+    Returns:
+        tuple: Una tupla (época, generación) por cada colección, en el mismo orden, con la época
+               como cadena. Las colecciones en las que todavía no se ha escrito tienen época None
+               y generación 0.
+    """
+    generations = {
+        document["_id"]: (str(document["epoch"]) if "epoch" in document else None, document["generation"])
+        for document in database[GENERATIONS_COLLECTION].find({"_id": {"$in": list(collection_names)}})
+    }
+    return tuple(generations.get(name, (None, 0)) for name in collection_names)
+
+
+class QueryCache:
+    """
+    Caché de resultados con una parte en memoria, limitada a 'max_size' entradas que se descartan
+    de la menos usada a la más usada, y una parte opcional en disco (un fichero 'shelve').
+
+    Cada entrada guarda las generaciones de las colecciones con las que se calculó. En disco solo
+    hay una entrada por consulta y colecciones, que se sustituye al volver a calcularla.
+    """
+
+    def __init__(self, max_size=query_cache_size, path=query_cache_path):
+        """
+        Args:
+            max_size (int): Número máximo de resultados en memoria.
+            path (str, optional): Ruta del fichero de la caché en disco. None para no usar disco.
+        """
+        self.max_size = max_size
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _disk_key(key):
+        """
+        Obtiene la clave de una entrada en el fichero de disco, que tiene que ser una cadena.
+        """
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key, generations):
+        """
+        Busca un resultado calculado con las generaciones indicadas, primero en memoria y después
+        en disco.
+
+        Args:
+            key (tuple): Clave de la consulta.
+            generations (tuple): Generaciones actuales de las colecciones de la consulta.
+
+        Returns:
+            tuple: Una tupla (encontrado, resultado).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generations:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+
+            if self.path is not None:
+                with shelve.open(self.path) as disk:
+                    entry = disk.get(self._disk_key(key))
+                if entry is not None and entry[0] == generations:
+                    self._remember(key, entry)
+                    self.hits += 1
+                    return True, entry[1]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key, generations, result):
+        """
+        Guarda un resultado en memoria y, si hay fichero, en disco.
+
+        Args:
+            key (tuple): Clave de la consulta.
+            generations (tuple): Generaciones de las colecciones con las que se ha calculado.
+            result: Resultado de la consulta.
+
+        Returns:
+            None
+        """
+        entry = (generations, result)
+        with self._lock:
+            self._remember(key, entry)
+            if self.path is not None:
+                with shelve.open(self.path) as disk:
+                    disk[self._disk_key(key)] = entry
+
+    def _remember(self, key, entry):
+        """
+        Guarda una entrada en memoria y descarta las menos usadas si se supera el tamaño máximo.
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Vacía la caché en memoria y en disco.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+            if self.path is not None:
+                with shelve.open(self.path) as disk:
+                    disk.clear()
+
+
+# Caché compartida por todas las consultas de queries.py
+query_cache = QueryCache()
+
+
+def cached_query(query):
+    """
+    Decorador que guarda en 'query_cache' los resultados de una función de consulta.
+
+    La función tiene que recibir como primeros argumentos la base de datos y una colección o una
+    lista de colecciones. La clave de cada resultado es el nombre de la función, la base de datos,
+    las colecciones y el resto de argumentos. Se devuelve una copia completa del resultado
+    guardado, incluidas las listas dentro de tuplas, para que quien lo reciba pueda modificarlo
+    sin cambiar la caché. Con 'use_cache=False' la consulta se ejecuta siempre y su resultado no
+    se guarda.
+
+    Args:
+        query (function): Función de consulta.
+
+    Returns:
+        function: Función con caché.
+    """
+    @wraps(query)
+    def wrapper(database, collection_names, *args, use_cache=True, **kwargs):
+        if not use_cache:
+            return query(database, collection_names, *args, **kwargs)
+
+        names = [collection_names] if isinstance(collection_names, str) else list(collection_names)
+        key = (query.__name__, database.name, tuple(names), args, tuple(sorted(kwargs.items())))
+        generations = collection_generations(database, names)
+
+        found, result = query_cache.get(key, generations)
+        if not found:
+            result = query(database, collection_names, *args, **kwargs)
+            query_cache.put(key, generations, result)
+        return copy.deepcopy(result)
+
+    return wrapper
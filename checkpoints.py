@@ -0,0 +1,113 @@
+"""
+checkpoints.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Diario de puntos de control de la carga. Para cada archivo guarda, por separado para MySQL y para
+MongoDB, el byte hasta el que se han confirmado los datos y el número de lotes confirmados, de forma
+que una carga interrumpida pueda continuar desde ese punto.
+"""
+
+import os
+import copy
+import json
+import threading
+
+# Destinos de los que se guarda el progreso de cada archivo
+TARGETS = ("mysql", "mongo")
+
+
+class CheckpointJournal:
+    """
+    Diario de puntos de control guardado en un fichero JSON.
+
+    Cada entrada tiene la forma:
+        {"mysql": {"offset": 0, "batch": 0}, "mongo": {"offset": 0, "batch": 0}, "done": False}
+
+    El fichero se reescribe entero en cada confirmación a través de un fichero temporal, por lo
+    que una interrupción nunca deja un diario a medias.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Ruta del fichero JSON del diario. Si existe, se carga su contenido.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fp:
+                self._entries = json.load(fp)
+
+    def reset(self):
+        """
+        Vacía el diario para empezar una carga nueva.
+        """
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def get(self, file_name):
+        """
+        Obtiene el progreso de un archivo.
+
+        Args:
+            file_name (str): Nombre del archivo.
+
+        Returns:
+            dict: Copia de la entrada del archivo.
+        """
+        with self._lock:
+            entry = self._entries.get(file_name) or self._new_entry()
+            return copy.deepcopy(entry)
+
+    def commit(self, file_name, target, offset, batch):
+        """
+        Registra que los datos de un archivo están confirmados en un destino hasta un byte.
+
+        Args:
+            file_name (str): Nombre del archivo.
+            target (str): "mysql" o "mongo".
+            offset (int): Byte del archivo hasta el que se han confirmado los datos.
+            batch (int): Número de lotes del archivo confirmados en el destino.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            entry = self._entries.setdefault(file_name, self._new_entry())
+            entry[target] = {"offset": offset, "batch": batch}
+            self._save()
+
+    def mark_done(self, file_name):
+        """
+        Registra que un archivo se ha cargado por completo en todos los destinos.
+        """
+        with self._lock:
+            self._entries.setdefault(file_name, self._new_entry())["done"] = True
+            self._save()
+
+    @staticmethod
+    def _new_entry():
+        entry = {target: {"offset": 0, "batch": 0} for target in TARGETS}
+        entry["done"] = False
+        return entry
+
+    def _save(self):
+        """
+        Escribe el diario en disco de forma atómica.
+        """
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as fp:
+            json.dump(self._entries, fp, indent=2)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,148 @@
+"""
+conexion_mysql.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Pool de conexiones a MySQL compartido por los programas de carga. Las conexiones se abren la primera
+vez que se necesitan y se reutilizan después, en lugar de abrir una conexión nueva en cada función.
+El pool también permite agrupar varias operaciones en una sola transacción, que se deshace entera
+si alguna de ellas falla.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+import pymysql
+
+# Pools abiertos, uno por cada combinación de servidor, usuario, base de datos y opciones
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones a una base de datos MySQL.
+
+    Uso:
+        pool = get_pool(host, user, password, database_name)
+        with pool.transaction() as cursor:
+            cursor.execute(...)
+
+    Como mucho hay 'max_size' conexiones abiertas a la vez; si están todas en uso, pedir otra
+    espera a que se devuelva alguna.
+    """
+
+    def __init__(self, host, user, password, database=None, max_size=4, **connect_args):
+        """
+        Args:
+            host (str): Dirección del servidor MySQL.
+            user (str): Nombre de usuario de MySQL.
+            password (str): Contraseña de MySQL.
+            database (str, optional): Nombre de la base de datos. None si todavía no existe.
+            max_size (int): Número máximo de conexiones abiertas a la vez.
+            **connect_args: Opciones adicionales de 'pymysql.connect', por ejemplo 'local_infile'.
+        """
+        self._connect_args = dict(host=host, user=user, password=password, database=database, **connect_args)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión del pool y la devuelve al salir del bloque. Los cambios que no se
+        hayan confirmado dentro del bloque se deshacen antes de devolverla.
+
+        Yields:
+            pymysql.connections.Connection: Conexión abierta.
+        """
+        self._slots.acquire()
+        try:
+            try:
+                connection_mysql = self._idle.get_nowait()
+                # Reabre la conexión si el servidor la ha cerrado mientras estaba libre
+                connection_mysql.ping(reconnect=True)
+            except queue.Empty:
+                connection_mysql = pymysql.connect(**self._connect_args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        try:
+            yield connection_mysql
+        finally:
+            try:
+                connection_mysql.rollback()
+                self._idle.put(connection_mysql)
+            except pymysql.MySQLError:
+                # Una conexión que ya no responde no se devuelve al pool
+                connection_mysql.close()
+            finally:
+                self._slots.release()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Ejecuta un bloque dentro de una transacción: al salir se confirma, y si hay un error se
+        deshace por completo.
+
+        Yields:
+            pymysql.cursors.Cursor: Cursor de la conexión de la transacción.
+        """
+        with self.connection() as connection_mysql:
+            connection_mysql.begin()
+            with connection_mysql.cursor() as cursor:
+                yield cursor
+            connection_mysql.commit()
+
+    def close(self):
+        """
+        Cierra las conexiones libres del pool.
+
+        Returns:
+            None
+        """
+        while True:
+            try:
+                connection_mysql = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection_mysql.close()
+
+
+def get_pool(host, user, password, database=None, **connect_args):
+    """
+    Obtiene el pool de conexiones de una base de datos, creándolo la primera vez.
+
+    Args:
+        host (str): Dirección del servidor MySQL.
+        user (str): Nombre de usuario de MySQL.
+        password (str): Contraseña de MySQL.
+        database (str, optional): Nombre de la base de datos.
+        **connect_args: Opciones adicionales de 'pymysql.connect'.
+
+    Returns:
+        ConnectionPool: Pool compartido por todas las llamadas con los mismos argumentos.
+    """
+    key = (host, user, password, database, tuple(sorted(connect_args.items())))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(host, user, password, database, **connect_args)
+        return _pools[key]
+
+def close_pools():
+    """
+    Cierra las conexiones libres de todos los pools.
+
+    Returns:
+        None
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -1,39 +1,78 @@
-"""
-configuracion.py
-
-Bases de Datos - IMAT
-ICAI, Universidad Pontificia Comillas
-
-Integrantes del grupo:
-    - Carlos Martínez
-    - Lydia Ruiz
-
-Descripción:
-En este fichero se indican el nombre de la base de datos de MySQL y de MongoDB, así como las credenciales 
-necesarias para conectarse a la base de datos y la ruta de la carpeta empleada.
-"""
-
-# CREDENCIALES MYSQL
-host = "localhost"
-user = ""
-password = ""
-
-# CONEXIÓN MONGODB
-CONNECTION_STRING = "mongodb://localhost:27017"
-
-# NOMBRES BASES DE DATOS
-database_name_SQL = "Reviews"
-database_name_MongoDB = "Reviews"
-database_name_MongoDB_PBi = "Reviews_PBi"
-
-# NEO4J
-
-uri_neo4j = "neo4j://localhost:7687"
-user_neo4j = ""
-contrasena_neo4j = ""
-
-# RUTA CARPETA
-folder_path = "Datos_proyecto/"  # Ruta de la carpeta que contiene los archivos JSON
-
-# NÚMERO DE USUARIOS CON MÁS REVIEWS (4.1 Neo4J)
+"""
+configuracion.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+En este fichero se indican el nombre de la base de datos de MySQL y de MongoDB, así como las credenciales 
+necesarias para conectarse a la base de datos y la ruta de la carpeta empleada.
+"""
+
+# CREDENCIALES MYSQL
+host = "localhost"
+user = ""
+password = ""
+
+# CONEXIÓN MONGODB
+CONNECTION_STRING = "mongodb://localhost:27017"
+
+# NOMBRES BASES DE DATOS
+database_name_SQL = "Reviews"
+database_name_MongoDB = "Reviews"
+database_name_MongoDB_PBi = "Reviews_PBi"
+collection_name_PBi = "reviews_collection"  # Colección única donde se cargan todas las reviews para PowerBI
+
+# NEO4J
+
+uri_neo4j = "neo4j://localhost:7687"
+user_neo4j = ""
+contrasena_neo4j = ""
+
+# CARGA DE DATOS
+load_PBi = True  # Si es True, load_data.py rellena también la colección de PowerBI en la misma lectura
+num_workers = 1  # Número de procesos que cargan archivos en paralelo (1 = carga secuencial)
+checkpoint_path = "checkpoints_carga.json"  # Diario de puntos de control de 'load_data.py --checkpoint/--resume'
+mysql_bulk_load = False  # Si es True, las tablas de MySQL se cargan con LOAD DATA LOCAL INFILE (requiere local_infile en el servidor)
+upsert_mode = False  # Si es True, las reviews y los artículos que ya existen se actualizan en lugar de duplicarse
+
+# DECODIFICACIÓN JSON
+json_backend = "auto"  # "auto", "msgspec", "orjson" o "json". Con "auto" se usa el más rápido instalado
+
+# ESCRITURA EN MONGODB
+mongo_writer_threads = 2  # Hilos que insertan lotes en MongoDB mientras se siguen leyendo los archivos
+mongo_queue_size = 8  # Lotes máximos en espera antes de frenar la lectura
+maintain_rollups = True  # Si es True, cada lote insertado actualiza los recuentos que usan las consultas (rollups.py)
+
+# CONSULTAS
+collection_options = ["Digital_Music", "Musical_Instruments", "Toys_and_Games", "Video_Games"]  # Categorías del menú y de los gráficos
+evolution_resolution = 86400  # Segundos de cada intervalo de la evolución de las reviews (None = un punto por review)
+evolution_max_points = 2000  # Puntos máximos de la gráfica de evolución de las reviews
+popularity_top_k = 100  # Artículos con más reviews que se obtienen exactos en la gráfica de popularidad (None = todos)
+popularity_tail_points = 1000  # Puntos máximos del resto de la curva de popularidad
+query_threads = 4  # Colecciones que se consultan a la vez cuando no se usa '$unionWith' (1 = una tras otra)
+
+# CACHÉ DE CONSULTAS
+query_cache_size = 32  # Resultados de consultas que se guardan en memoria (se descartan primero los menos usados)
+query_cache_path = None  # Fichero donde se guardan también los resultados entre ejecuciones; None para no usar disco
+
+# GRÁFICOS SIN VENTANA (render_graficos.py)
+charts_path = "graficos/"  # Carpeta donde se guardan los gráficos y su manifiesto
+chart_format = "png"  # Formato de los gráficos: "png" o "svg"
+render_workers = 4  # Procesos que generan gráficos a la vez
+
+# DEMONIO DE INGESTA
+daemon_poll_interval = 5  # Segundos entre dos revisiones de la carpeta de datos
+daemon_workers = 2  # Archivos que se cargan a la vez
+daemon_journal_path = "daemon_ingesta.json"  # Bytes ya cargados de cada archivo de la carpeta
+daemon_metrics_path = "daemon_metricas.json"  # Métricas de rendimiento y de la cola del demonio
+
+# RUTA CARPETA
+folder_path = "Datos_proyecto/"  # Ruta de la carpeta que contiene los archivos JSON
+
+# NÚMERO DE USUARIOS CON MÁS REVIEWS (4.1 Neo4J)
 top_n = 30
\ No newline at end of file
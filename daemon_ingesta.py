@@ -0,0 +1,369 @@
+"""
+daemon_ingesta.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa que vigila la carpeta de datos y carga en las bases de datos los archivos nuevos y lo que
+se añade a los archivos ya cargados, usando la carga incremental de inserta_dataset.py. Los archivos
+se cargan con un número limitado de hilos, el diario de puntos de control guarda hasta qué byte se
+ha cargado cada archivo y las métricas de rendimiento y de la cola se escriben en un fichero JSON.
+
+Si está instalada la librería 'inotify_simple', la carpeta se revisa en cuanto cambia un archivo;
+si no, se revisa cada 'daemon_poll_interval' segundos.
+
+En los archivos sin comprimir solo se cargan líneas completas, por si se están escribiendo. Si un
+archivo termina en una línea sin salto de línea final y su tamaño y fecha de modificación no
+cambian durante una revisión, se carga también esa línea.
+
+Con el diario vacío el demonio carga todos los archivos de la carpeta desde el principio (en modo
+upsert, por lo que no se duplican). Si los archivos ya se cargaron con load_data.py, se puede
+ejecutar una vez con --marcar-cargados para anotarlos como cargados sin volver a leerlos.
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from pymongo import MongoClient
+from checkpoints import CheckpointJournal
+from conexion_mysql import close_pools
+from ingesta import is_compressed
+from inserta_dataset import ingest_new_file
+from load_data import list_data_files
+
+from configuracion import (
+    database_name_MongoDB,
+    daemon_poll_interval,
+    daemon_workers,
+    daemon_journal_path,
+    daemon_metrics_path,
+    CONNECTION_STRING,
+    folder_path,
+)
+
+# Aviso de cambios en la carpeta, opcional
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+class IngestionDaemon:
+    """
+    Vigila una carpeta y carga sus archivos con varios hilos.
+
+    Un archivo está pendiente si no se ha cargado nunca o si ha crecido desde la última carga.
+    Cada archivo se encola una sola vez aunque cambie varias veces mientras espera, y al terminar
+    de cargarlo se anota en el diario el byte hasta el que se ha leído.
+    """
+
+    def __init__(self, folder_path, database, journal, num_workers=daemon_workers,
+                 poll_interval=daemon_poll_interval, metrics_path=daemon_metrics_path):
+        """
+        Args:
+            folder_path (str): Ruta de la carpeta que contiene los ficheros.
+            database (pymongo.database.Database): Base de datos de MongoDB.
+            journal (CheckpointJournal): Diario con los bytes cargados de cada archivo.
+            num_workers (int): Número de archivos que se cargan a la vez.
+            poll_interval (float): Segundos entre dos revisiones de la carpeta.
+            metrics_path (str): Ruta del fichero JSON de métricas.
+        """
+        self.folder_path = folder_path
+        self.database = database
+        self.journal = journal
+        self.poll_interval = poll_interval
+        self.metrics_path = metrics_path
+
+        self._queue = queue.Queue()
+        self._scheduled = set()     # Archivos en la cola o cargándose
+        self._stalled = {}          # (tamaño, fecha de modificación, momento) de los archivos que
+                                    # terminan en una línea sin salto de línea
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        # Métricas
+        self._started = time.time()
+        self.files_ingested = 0
+        self.documents = 0
+        self.bytes = 0
+        self.busy_workers = 0
+        self.errors = 0
+        self.last_error = None
+
+        self._workers = [
+            threading.Thread(target=self._run, daemon=True) for _ in range(num_workers)
+        ]
+
+    def pending_files(self):
+        """
+        Obtiene los archivos de la carpeta con datos sin cargar.
+
+        Returns:
+            list: Lista de tuplas (archivo, byte desde el que cargarlo, si se carga también la
+                  última línea aunque no tenga salto de línea).
+        """
+        pending = []
+        for file in list_data_files(self.folder_path):
+            file_path = os.path.join(self.folder_path, file)
+            if not os.path.isfile(file_path) or not (file.endswith(".json") or is_compressed(file)):
+                continue
+
+            checkpoint = self.journal.get(file)
+            offset = checkpoint["mongo"]["offset"]
+
+            # Un archivo comprimido se carga una sola vez; uno sin comprimir, cada vez que crece
+            if is_compressed(file):
+                if not checkpoint["done"]:
+                    pending.append((file, offset, False))
+                continue
+
+            status = os.stat(file_path)
+            if status.st_size <= offset:
+                continue
+
+            stalled = self._stalled.get(file)
+            if stalled is None or stalled[:2] != (status.st_size, status.st_mtime):
+                pending.append((file, offset, False))
+            elif time.monotonic() - stalled[2] >= self.poll_interval:
+                # La última línea no ha cambiado durante una revisión: se da por terminada
+                pending.append((file, offset, True))
+
+        return pending
+
+    def mark_loaded(self):
+        """
+        Anota en el diario todos los archivos de la carpeta como cargados hasta su tamaño actual,
+        sin leerlos. Sirve para empezar a vigilar una carpeta que ya se cargó con load_data.py.
+
+        Returns:
+            int: Número de archivos anotados.
+        """
+        marked = 0
+        for file, _, _ in self.pending_files():
+            if is_compressed(file):
+                self.journal.mark_done(file)
+            else:
+                size = os.path.getsize(os.path.join(self.folder_path, file))
+                for target in ("mongo", "mysql"):
+                    self.journal.commit(file, target, size, self.journal.get(file)[target]["batch"])
+            marked += 1
+        return marked
+
+    def scan(self):
+        """
+        Encola los archivos pendientes que no están ya en la cola.
+
+        Returns:
+            int: Número de archivos encolados.
+        """
+        queued = 0
+        for file, offset, last_line in self.pending_files():
+            with self._lock:
+                if file in self._scheduled:
+                    continue
+                self._scheduled.add(file)
+            self._queue.put((file, offset, last_line))
+            queued += 1
+        return queued
+
+    def _run(self):
+        """
+        Bucle de cada hilo: saca archivos de la cola y los carga desde su último byte cargado.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            file, offset, last_line = item
+            with self._lock:
+                self.busy_workers += 1
+            try:
+                self._ingest(file, offset, last_line)
+            except Exception as error:
+                # El archivo vuelve a estar pendiente y se reintenta en la siguiente revisión
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = f"{file}: {error!r}"
+                print(f"[demonio] Error al cargar {file}: {error!r}")
+            finally:
+                with self._lock:
+                    self.busy_workers -= 1
+                    self._scheduled.discard(file)
+
+    def _ingest(self, file, offset, last_line=False):
+        """
+        Carga un archivo desde un byte y anota en el diario hasta dónde se ha cargado. Con
+        'last_line' se carga también una última línea sin salto de línea.
+        """
+        file_path = os.path.join(self.folder_path, file)
+        checkpoint = self.journal.get(file)
+        status = os.stat(file_path)
+
+        # Si una carga anterior falló a medias, parte de las reviews y artículos existen ya, por
+        # lo que se usa siempre el modo upsert. En los archivos sin comprimir solo se leen líneas
+        # completas por si el archivo se está escribiendo; los comprimidos se cargan enteros
+        end, documents = ingest_new_file(
+            file_path, self.database, start=offset, upsert=True,
+            complete_lines_only=not (is_compressed(file) or last_line),
+        )
+        if end == offset:
+            with self._lock:
+                stalled = self._stalled.get(file)
+                if stalled is None or stalled[:2] != (status.st_size, status.st_mtime):
+                    self._stalled[file] = (status.st_size, status.st_mtime, time.monotonic())
+                    print(
+                        f"[demonio] {file}: la última línea no tiene salto de línea; se cargará "
+                        f"si el archivo no cambia en {self.poll_interval} s"
+                    )
+            return
+
+        for target in ("mongo", "mysql"):
+            self.journal.commit(file, target, end, checkpoint[target]["batch"] + 1)
+        if is_compressed(file):
+            self.journal.mark_done(file)
+
+        with self._lock:
+            self._stalled.pop(file, None)
+            self.files_ingested += 1
+            self.documents += documents
+            self.bytes += end - offset
+        print(f"[demonio] {file}: {documents} reviews cargadas (bytes {offset}-{end})")
+
+    def metrics(self):
+        """
+        Obtiene las métricas de rendimiento y de la cola.
+
+        Returns:
+            dict: Diccionario con las métricas.
+        """
+        elapsed = time.time() - self._started
+        with self._lock:
+            return {
+                "uptime_seconds": round(elapsed, 1),
+                "files_ingested": self.files_ingested,
+                "documents": self.documents,
+                "bytes": self.bytes,
+                "documents_per_second": round(self.documents / elapsed, 1) if elapsed else 0.0,
+                "bytes_per_second": round(self.bytes / elapsed, 1) if elapsed else 0.0,
+                "queue_depth": self._queue.qsize(),
+                "busy_workers": self.busy_workers,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
+
+    def write_metrics(self):
+        """
+        Escribe las métricas en el fichero JSON de forma atómica, para que otro programa pueda
+        leerlas en cualquier momento.
+
+        Returns:
+            dict: Métricas escritas.
+        """
+        metrics = self.metrics()
+        temporary_path = f"{self.metrics_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as fp:
+            json.dump(metrics, fp, indent=2)
+        os.replace(temporary_path, self.metrics_path)
+        return metrics
+
+    def _wait_for_changes(self, notifier):
+        """
+        Espera hasta la siguiente revisión de la carpeta, o hasta que cambie un archivo si hay inotify.
+        """
+        if notifier is None:
+            self._stop.wait(self.poll_interval)
+        else:
+            notifier.read(timeout=int(self.poll_interval * 1000))
+
+    def run(self):
+        """
+        Revisa la carpeta hasta que se llama a 'stop' o se pulsa Ctrl+C. Al terminar espera a que
+        acaben los archivos que se están cargando; los que quedan en la cola se cargan en la
+        siguiente ejecución.
+
+        Returns:
+            None
+        """
+        for worker in self._workers:
+            worker.start()
+
+        notifier = None
+        if INotify is not None:
+            notifier = INotify()
+            notifier.add_watch(self.folder_path, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MODIFY)
+
+        print(f"[demonio] Vigilando {self.folder_path} ({'inotify' if notifier else 'sondeo'})")
+        try:
+            while not self._stop.is_set():
+                queued = self.scan()
+                metrics = self.write_metrics()
+                if queued or metrics["busy_workers"]:
+                    print(
+                        f"[demonio] cola: {metrics['queue_depth']}, cargando: {metrics['busy_workers']}, "
+                        f"{metrics['documents_per_second']} reviews/s"
+                    )
+                self._wait_for_changes(notifier)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+            if notifier is not None:
+                notifier.close()
+            self._shutdown()
+
+    def stop(self):
+        """
+        Pide al demonio que deje de revisar la carpeta. Se puede llamar desde otro hilo.
+
+        Returns:
+            None
+        """
+        self._stop.set()
+
+    def _shutdown(self):
+        """
+        Detiene los hilos y escribe las métricas finales.
+        """
+        # Vacía la cola para que los hilos reciban enseguida la señal de parada
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+        self.write_metrics()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Vigila la carpeta de datos y carga los cambios.")
+    parser.add_argument(
+        "--marcar-cargados", action="store_true",
+        help="Anota los archivos actuales como ya cargados (por ejemplo con load_data.py) y termina.",
+    )
+    args = parser.parse_args()
+
+    client = MongoClient(CONNECTION_STRING)
+    journal = CheckpointJournal(daemon_journal_path)
+
+    with client:
+        daemon = IngestionDaemon(folder_path, client[database_name_MongoDB], journal)
+        if args.marcar_cargados:
+            print(f"[demonio] {daemon.mark_loaded()} archivos anotados como cargados")
+        else:
+            daemon.run()
+
+    close_pools()
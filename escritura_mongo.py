@@ -0,0 +1,259 @@
+"""
+escritura_mongo.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Escritor de lotes para MongoDB que solapa la lectura de los archivos con las inserciones. El
+programa de carga deja cada lote en una cola acotada y uno o varios hilos lo insertan con
+'insert_many' desordenado mientras se sigue leyendo el archivo. En modo upsert cada documento se
+inserta o actualiza según su clave natural, de forma que volver a cargar un archivo no lo duplica.
+"""
+
+import time
+import queue
+import threading
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Código de error de MongoDB para una clave duplicada
+DUPLICATE_KEY_ERROR = 11000
+
+# Límites superiores (en milisegundos) de los intervalos del histograma de latencias
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+
+class PipelinedWriter:
+    """
+    Inserta lotes de documentos en MongoDB desde hilos en segundo plano.
+
+    Uso:
+        with PipelinedWriter(num_threads=2, queue_size=8) as writer:
+            writer.put(collection, batch)
+
+    Al salir del bloque se espera a que se inserten todos los lotes pendientes. Si alguna
+    inserción falla, el error se vuelve a lanzar en el hilo que usa el escritor.
+    """
+
+    def __init__(self, num_threads=1, queue_size=8, ignore_duplicates=False, upsert_keys=None, after_write=None):
+        """
+        Args:
+            num_threads (int): Número de hilos que insertan lotes a la vez. Con un solo hilo
+                               los lotes se insertan en el mismo orden en que se añaden.
+            queue_size (int): Número máximo de lotes en espera. Cuando la cola está llena,
+                              'put' se bloquea hasta que un hilo libera hueco.
+            ignore_duplicates (bool): Si es True, los documentos cuyo '_id' ya existe se ignoran
+                                      en lugar de producir un error. Permite repetir un lote.
+            upsert_keys (list, optional): Campos que identifican una review. Si se indican, cada
+                                          documento se inserta o, si ya existe otro con los mismos
+                                          valores en esos campos, se actualiza. La primera vez que
+                                          se escribe en una colección se crea un índice único con
+                                          esos campos.
+            after_write (function, optional): Función (colección, documentos) que se llama desde
+                                              el hilo escritor tras escribir cada lote, con los
+                                              documentos que se han insertado por primera vez.
+        """
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._ignore_duplicates = ignore_duplicates
+        self._upsert_keys = upsert_keys
+        self._after_write = after_write
+        self._indexed_collections = set()
+        self._lock = threading.Lock()
+        self._error = None
+
+        # Estadísticas de la carga
+        self.batches = 0
+        self.documents = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.backpressure_events = 0
+        self.backpressure_seconds = 0.0
+        self.latency_histogram = [0] * len(LATENCY_BUCKETS_MS)
+
+        self._threads = [
+            threading.Thread(target=self._run, daemon=True) for _ in range(num_threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Si el bloque ya está lanzando una excepción, el error del escritor no la oculta
+        self.close(raise_error=exc_type is None)
+
+    def _run(self):
+        """
+        Bucle de cada hilo: saca lotes de la cola y los inserta hasta recibir None.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            collection, batch, on_done, upsert_keys = item
+            # Tras un error se descartan los lotes restantes para que 'close' no se quede esperando
+            if self._error is None:
+                start = time.perf_counter()
+                try:
+                    inserted_documents, updated, skipped = self._write(collection, batch, upsert_keys)
+                    if self._after_write is not None:
+                        self._after_write(collection, inserted_documents)
+                    if on_done is not None:
+                        on_done()
+                except Exception as error:
+                    self._error = error
+                else:
+                    counts = (len(inserted_documents), updated, skipped)
+                    self._record_batch(len(batch), counts, time.perf_counter() - start)
+            self._queue.task_done()
+
+    def _write(self, collection, batch, upsert_keys):
+        """
+        Escribe un lote con 'insert_many' o, en modo upsert, con 'bulk_write' buscando cada
+        documento por los campos 'upsert_keys'.
+
+        Returns:
+            tuple: Una tupla (documentos insertados, número de actualizados, número sin cambios).
+        """
+        if upsert_keys is None:
+            inserted_documents = self._insert(collection, batch)
+            return inserted_documents, 0, len(batch) - len(inserted_documents)
+
+        requests = [
+            UpdateOne({key: document.get(key) for key in upsert_keys}, {"$set": document}, upsert=True)
+            for document in batch
+        ]
+        result = collection.bulk_write(requests, ordered=False)
+        inserted_documents = [batch[index] for index in result.upserted_ids]
+        return inserted_documents, result.modified_count, result.matched_count - result.modified_count
+
+    def _insert(self, collection, batch):
+        """
+        Inserta un lote sin orden, ignorando si procede los documentos que ya existen.
+
+        Returns:
+            list: Documentos del lote que se han insertado.
+        """
+        try:
+            collection.insert_many(batch, ordered=False)
+        except BulkWriteError as error:
+            write_errors = error.details.get("writeErrors", [])
+            duplicates_only = all(
+                write_error["code"] == DUPLICATE_KEY_ERROR for write_error in write_errors
+            )
+            if not (self._ignore_duplicates and write_errors and duplicates_only
+                    and not error.details.get("writeConcernErrors")):
+                raise
+            duplicates = {write_error["index"] for write_error in write_errors}
+            return [document for index, document in enumerate(batch) if index not in duplicates]
+        return batch
+
+    def _record_batch(self, size, counts, seconds):
+        """
+        Registra un lote escrito y su latencia en el histograma.
+        """
+        milliseconds = seconds * 1000
+        inserted, updated, skipped = counts
+        with self._lock:
+            self.batches += 1
+            self.documents += size
+            self.inserted += inserted
+            self.updated += updated
+            self.skipped += skipped
+            for count, limit in enumerate(LATENCY_BUCKETS_MS):
+                if milliseconds <= limit:
+                    self.latency_histogram[count] += 1
+                    break
+
+    def put(self, collection, batch, on_done=None, extra_keys=()):
+        """
+        Añade un lote a la cola de inserción.
+
+        Args:
+            collection (pymongo.collection.Collection): Colección en la que insertar el lote.
+            batch (list): Lista de documentos. No debe modificarse después de añadirla.
+            on_done (function, optional): Función sin argumentos que se llama desde el hilo
+                                          escritor cuando el lote se ha insertado.
+            extra_keys (iterable): Campos que en modo upsert se añaden a 'upsert_keys' para
+                                   identificar los documentos de esta colección, por ejemplo el
+                                   'type' de la colección de PowerBI, que tiene todas las
+                                   categorías. Deben ser siempre los mismos en cada colección.
+
+        Returns:
+            None
+        """
+        if self._error is not None:
+            raise self._error
+
+        upsert_keys = None if self._upsert_keys is None else [*self._upsert_keys, *extra_keys]
+
+        # El índice único hace que cada upsert busque la review por índice y evita duplicados
+        if upsert_keys is not None and collection.full_name not in self._indexed_collections:
+            collection.create_index([(key, ASCENDING) for key in upsert_keys], unique=True)
+            self._indexed_collections.add(collection.full_name)
+
+        item = (collection, batch, on_done, upsert_keys)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # La cola está llena: la lectura va más rápido que MongoDB
+            start = time.perf_counter()
+            self._queue.put(item)
+            self.backpressure_events += 1
+            self.backpressure_seconds += time.perf_counter() - start
+
+    def close(self, raise_error=True):
+        """
+        Espera a que se inserten todos los lotes pendientes y detiene los hilos.
+
+        Args:
+            raise_error (bool): Si es True, se lanza el error de algún hilo escritor, si lo hubo.
+
+        Returns:
+            None
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if raise_error and self._error is not None:
+            raise self._error
+
+    def report(self, label=""):
+        """
+        Muestra por pantalla los lotes insertados, la contrapresión y el histograma de latencias.
+
+        Args:
+            label (str): Texto que identifica la carga en el informe.
+
+        Returns:
+            None
+        """
+        print(f"[{label}] {self.documents} documentos en {self.batches} lotes")
+        if self._upsert_keys is not None or self.skipped:
+            print(
+                f"[{label}] {self.inserted} insertados, {self.updated} actualizados, "
+                f"{self.skipped} sin cambios"
+            )
+        print(
+            f"[{label}] Contrapresión: {self.backpressure_events} esperas, "
+            f"{self.backpressure_seconds:.2f} s con la cola llena"
+        )
+
+        lower = 0
+        for limit, count in zip(LATENCY_BUCKETS_MS, self.latency_histogram):
+            if count:
+                upper = "inf" if limit == float("inf") else f"{limit}"
+                print(f"[{label}]   {lower}-{upper} ms: {count} lotes")
+            lower = limit
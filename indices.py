@@ -0,0 +1,131 @@
+"""
+indices.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Creación de los índices que necesitan las consultas de queries.py. Se ejecuta al terminar la carga,
+y no antes, para que las inserciones masivas no tengan que mantener los índices en cada lote.
+Para cada índice se muestra el tiempo de creación y el tamaño que ocupa.
+"""
+
+import time
+import pymysql
+from conexion_mysql import get_pool
+from pymongo import ASCENDING
+
+# Campos de las colecciones de MongoDB por los que agrupan las consultas
+MONGO_INDEX_FIELDS = ["reviewTime", "asin", "overall", "reviewerID"]
+
+# Índices de MySQL: (tabla, nombre del índice, columnas)
+MYSQL_INDEXES = [("Items", "idx_items_asin", "Asin")]
+
+
+def build_mongo_indexes(database, collection_names, fields=MONGO_INDEX_FIELDS):
+    """
+    Crea en cada colección un índice por cada campo indicado y muestra el tiempo de creación
+    y el tamaño de cada índice. Si un índice ya existe, MongoDB no lo vuelve a crear.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        collection_names (list): Lista de nombres de colecciones.
+        fields (list): Lista de campos a indexar.
+
+    Returns:
+        dict: Diccionario {colección: {índice: (segundos, bytes)}}.
+    """
+    report = {}
+
+    for collection_name in collection_names:
+        collection = database[collection_name]
+
+        build_times = {}
+        for field in fields:
+            start = time.perf_counter()
+            index_name = collection.create_index([(field, ASCENDING)])
+            build_times[index_name] = time.perf_counter() - start
+
+        # Tamaño de cada índice según las estadísticas de la colección
+        index_sizes = database.command("collStats", collection_name).get("indexSizes", {})
+
+        report[collection_name] = {}
+        for index_name, seconds in build_times.items():
+            size = index_sizes.get(index_name, 0)
+            report[collection_name][index_name] = (seconds, size)
+            print(f"[MongoDB] {collection_name}.{index_name}: {seconds:.2f} s, {size / 1024 ** 2:.2f} MB")
+
+    return report
+
+def get_mysql_index_size(cursor, database_name, table_name, index_name):
+    """
+    Obtiene el tamaño en bytes de un índice de InnoDB.
+
+    Returns:
+        int: Tamaño del índice, o None si el usuario no puede leer las estadísticas de InnoDB.
+    """
+    try:
+        cursor.execute(
+            """SELECT stat_value * @@innodb_page_size
+               FROM mysql.innodb_index_stats
+               WHERE database_name = %s AND table_name = %s
+                 AND index_name = %s AND stat_name = 'size';""",
+            (database_name, table_name, index_name),
+        )
+    except pymysql.MySQLError:
+        return None
+
+    result = cursor.fetchone()
+    return int(result[0]) if result else None
+
+def build_mysql_indexes(host, user, password, database_name, indexes=MYSQL_INDEXES, unique=False):
+    """
+    Crea los índices secundarios de MySQL que no existan y muestra el tiempo de creación
+    y el tamaño de cada uno.
+
+    Args:
+        host (str): Dirección del servidor MySQL.
+        user (str): Nombre de usuario de MySQL.
+        password (str): Contraseña de MySQL.
+        database_name (str): Nombre de la base de datos.
+        indexes (list): Lista de tuplas (tabla, nombre del índice, columnas).
+        unique (bool): Si es True, los índices se crean como únicos.
+
+    Returns:
+        dict: Diccionario {índice: (segundos, bytes)}.
+    """
+    report = {}
+
+    with get_pool(host, user, password, database_name).connection() as connection_mysql:
+        cursor = connection_mysql.cursor()
+
+        for table_name, index_name, columns in indexes:
+            cursor.execute(
+                """SELECT COUNT(*) FROM information_schema.STATISTICS
+                   WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s;""",
+                (database_name, table_name, index_name),
+            )
+            (exists,) = cursor.fetchone()
+
+            start = time.perf_counter()
+            if not exists:
+                index_type = "UNIQUE INDEX" if unique else "INDEX"
+                cursor.execute(f"CREATE {index_type} {index_name} ON {table_name} ({columns});")
+            seconds = time.perf_counter() - start
+
+            # Actualiza las estadísticas para que el tamaño del índice sea el real
+            cursor.execute(f"ANALYZE TABLE {table_name};")
+            cursor.fetchall()
+            size = get_mysql_index_size(cursor, database_name, table_name, index_name)
+
+            report[index_name] = (seconds, size)
+            size_text = "tamaño no disponible" if size is None else f"{size / 1024 ** 2:.2f} MB"
+            print(f"[MySQL] {table_name}.{index_name}: {seconds:.2f} s, {size_text}")
+
+        cursor.close()
+
+    return report
@@ -0,0 +1,389 @@
+"""
+ingesta.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Funciones comunes a los programas de carga para leer los archivos JSON de reviews. Permiten dividir
+un archivo grande en rangos de bytes alineados con los saltos de línea, de forma que cada rango
+pueda procesarse en un proceso distinto, un decodificador JSON que solo construye los campos
+necesarios y un conversor de fechas con caché para el campo 'reviewTime'. Los archivos pueden estar
+comprimidos con gzip, bz2 o xz: se descomprimen al vuelo según su extensión.
+"""
+
+import os
+import bz2
+import gzip
+import lzma
+import mmap
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any
+from pymongo import MongoClient
+from escritura_mongo import PipelinedWriter
+from rollups import record_batch
+from cache_consultas import bump_generation
+from configuracion import json_backend, mongo_writer_threads, mongo_queue_size, upsert_mode, maintain_rollups
+
+# Decodificadores JSON opcionales, más rápidos que el módulo estándar
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tamaño mínimo de cada rango: por debajo de este tamaño no compensa repartir un archivo
+MIN_CHUNK_SIZE = 1 << 20
+
+# Funciones para abrir cada tipo de archivo comprimido, según su extensión
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+# Número máximo de fechas distintas que se guardan ya convertidas
+REVIEW_TIME_CACHE_SIZE = 1 << 16
+
+# Campos que identifican una review en el modo upsert
+REVIEW_KEY_FIELDS = ["reviewerID", "asin", "unixReviewTime"]
+
+
+def _select_backend(backend):
+    """
+    Elige el decodificador JSON a usar según la configuración y las librerías instaladas.
+    """
+    if backend == "auto":
+        if msgspec is not None:
+            return "msgspec"
+        if orjson is not None:
+            return "orjson"
+        return "json"
+
+    if backend == "msgspec" and msgspec is None or backend == "orjson" and orjson is None:
+        raise ImportError(f"El decodificador JSON '{backend}' no está instalado")
+    return backend
+
+@lru_cache(maxsize=None)
+def get_decoder(fields=None, backend=json_backend):
+    """
+    Devuelve una función que decodifica una línea JSON en un diccionario con solo los campos pedidos.
+
+    Con msgspec la línea se decodifica directamente en una estructura con esos campos, de forma que
+    el resto de valores (por ejemplo 'reviewText' cuando no se necesita) se saltan sin llegar a
+    construirse. Con orjson o json la línea se decodifica entera y después se seleccionan los campos.
+    Los campos que no aparecen en la línea no se incluyen en el diccionario, para que cada programa
+    pueda aplicar su propio valor por defecto con 'get'.
+
+    Args:
+        fields (tuple, optional): Campos a extraer. Si es None se devuelven todos los campos.
+        backend (str): "auto", "msgspec", "orjson" o "json".
+
+    Returns:
+        function: Función que recibe una línea (bytes o str) y devuelve un diccionario.
+    """
+    backend = _select_backend(backend)
+
+    if backend == "msgspec":
+        if fields is None:
+            return msgspec.json.Decoder().decode
+
+        review_type = msgspec.defstruct("Review", [(field, Any, msgspec.UNSET) for field in fields])
+        decoder = msgspec.json.Decoder(review_type)
+
+        def decode(line):
+            review = decoder.decode(line)
+            return {
+                field: value for field in fields
+                if (value := getattr(review, field)) is not msgspec.UNSET
+            }
+
+        return decode
+
+    loads = orjson.loads if backend == "orjson" else json.loads
+    if fields is None:
+        return loads
+
+    def decode(line):
+        review = loads(line)
+        return {field: review[field] for field in fields if field in review}
+
+    return decode
+
+@lru_cache(maxsize=REVIEW_TIME_CACHE_SIZE)
+def _parse_review_time_string(review_time):
+    """
+    Convierte una fecha con formato "%m %d, %Y" en un objeto datetime. Al estar memorizada,
+    'strptime' solo se ejecuta una vez por cada fecha distinta del conjunto de datos.
+    """
+    return datetime.strptime(review_time, "%m %d, %Y")
+
+def parse_review_time(review_time, unix_review_time=None):
+    """
+    Obtiene la fecha de una review a partir de su campo 'reviewTime' o, si falta, a partir
+    de su campo 'unixReviewTime'.
+
+    Args:
+        review_time (str): Fecha de la review con formato "%m %d, %Y".
+        unix_review_time (int, optional): Marca de tiempo Unix de la review.
+
+    Returns:
+        datetime: Fecha de la review, sin hora.
+
+    Raises:
+        ValueError: Si la review no tiene ninguno de los dos campos.
+    """
+    if review_time:
+        return _parse_review_time_string(review_time)
+
+    if unix_review_time not in (None, ""):
+        # La marca de tiempo corresponde a la medianoche UTC del día de la review
+        day = datetime.fromtimestamp(int(unix_review_time), tz=timezone.utc)
+        return datetime(day.year, day.month, day.day)
+
+    raise ValueError("La review no tiene 'reviewTime' ni 'unixReviewTime'")
+
+def after_batch(collection, documents):
+    """
+    Función para el parámetro 'after_write' de PipelinedWriter: actualiza los recuentos de las
+    consultas con las reviews insertadas, si se mantienen, e incrementa la generación de la
+    colección para que la caché de consultas no use resultados anteriores al lote.
+
+    Args:
+        collection (pymongo.collection.Collection): Colección en la que se ha escrito el lote.
+        documents (list): Reviews insertadas.
+
+    Returns:
+        None
+    """
+    if maintain_rollups:
+        record_batch(collection, documents)
+    # Después de los recuentos, para que una consulta con la nueva generación ya los vea
+    bump_generation(collection)
+
+def open_writer(num_threads=mongo_writer_threads, upsert=upsert_mode):
+    """
+    Crea el escritor de lotes de MongoDB según la configuración. En modo upsert las reviews
+    se identifican por 'REVIEW_KEY_FIELDS', y después de cada lote se llama a 'after_batch'.
+
+    Args:
+        num_threads (int): Número de hilos escritores.
+        upsert (bool): Si es True, se usa el modo upsert.
+
+    Returns:
+        PipelinedWriter: Escritor de lotes.
+    """
+    upsert_keys = REVIEW_KEY_FIELDS if upsert else None
+    return PipelinedWriter(num_threads, mongo_queue_size, upsert_keys=upsert_keys, after_write=after_batch)
+
+
+def is_compressed(file_path):
+    """
+    Indica si un archivo está comprimido según su extensión.
+    """
+    return os.path.splitext(file_path)[1].lower() in COMPRESSED_OPENERS
+
+def open_review_file(file_path):
+    """
+    Abre un archivo JSON en modo binario, descomprimiéndolo al vuelo si su extensión es
+    .gz, .bz2 o .xz.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+
+    Returns:
+        file: Objeto archivo del que se leen las líneas en bytes.
+    """
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(file_path)[1].lower(), open)
+    return opener(file_path, "rb")
+
+def category_from_filename(file_name):
+    """
+    Obtiene el nombre de la categoría a partir del nombre de un archivo de reviews,
+    por ejemplo 'Books' a partir de 'Books_5.json' o de 'Books_5.json.gz'.
+
+    Args:
+        file_name (str): Nombre o ruta del archivo.
+
+    Returns:
+        str: Nombre de la categoría.
+    """
+    name = os.path.basename(file_name)
+    if is_compressed(name):
+        name = os.path.splitext(name)[0]
+
+    for suffix in ("_5.json", ".json"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def split_file_ranges(file_path, num_chunks, min_chunk_size=MIN_CHUNK_SIZE):
+    """
+    Divide un archivo JSON en rangos de bytes que empiezan y terminan en un salto de línea.
+    Un archivo comprimido no puede dividirse, por lo que se devuelve un único rango completo.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        num_chunks (int): Número máximo de rangos en los que dividir el archivo.
+        min_chunk_size (int): Tamaño mínimo en bytes de cada rango.
+
+    Returns:
+        list: Lista de tuplas (inicio, fin) con los rangos de bytes, en orden.
+    """
+    if is_compressed(file_path):
+        return [(0, None)]
+
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+
+    num_chunks = max(1, min(num_chunks, size // min_chunk_size))
+
+    bounds = [0]
+    with open(file_path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for count in range(1, num_chunks):
+            # Avanza hasta el final de la línea en la que cae el corte aproximado
+            newline = mm.find(b"\n", max(size * count // num_chunks, bounds[-1]))
+            if newline == -1 or newline + 1 >= size:
+                break
+            bounds.append(newline + 1)
+    bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def read_lines(file_path, start=0, end=None):
+    """
+    Recorre las líneas de un archivo JSON, opcionalmente solo las de un rango de bytes.
+    Los archivos comprimidos solo pueden leerse completos.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        start (int): Byte de inicio del rango. Debe ser el comienzo de una línea.
+        end (int, optional): Byte de fin del rango. Si es None se lee hasta el final del archivo.
+
+    Yields:
+        bytes: Cada una de las líneas del rango.
+    """
+    if start == 0 and end is None:
+        with open_review_file(file_path) as fp:
+            yield from fp
+        return
+
+    if is_compressed(file_path):
+        raise ValueError(f"No se puede leer un rango de bytes del archivo comprimido {file_path}")
+
+    with open(file_path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = len(mm) if end is None else end
+        position = start
+        while position < end:
+            newline = mm.find(b"\n", position, end)
+            line_end = end if newline == -1 else newline + 1
+            yield mm[position:line_end]
+            position = line_end
+
+def read_lines_with_offsets(file_path, start=0):
+    """
+    Recorre las líneas de un archivo JSON desde un byte dado, indicando el byte en que empieza
+    cada línea. En los archivos comprimidos los bytes se cuentan sobre el contenido descomprimido.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        start (int): Byte desde el que empezar a leer. Debe ser el comienzo de una línea.
+
+    Yields:
+        tuple: Tuplas (byte de inicio, línea) de cada línea del archivo.
+    """
+    with open_review_file(file_path) as fp:
+        # En los archivos comprimidos 'seek' descomprime y descarta hasta la posición pedida
+        if start:
+            fp.seek(start)
+
+        offset = start
+        for line in fp:
+            yield offset, line
+            offset += len(line)
+
+def insert_range(task):
+    """
+    Inserta en una colección MongoDB las reviews de un rango de bytes de un archivo JSON.
+    Se ejecuta dentro de un proceso del pool, por lo que abre su propia conexión.
+
+    Args:
+        task (tuple): Tupla (ruta, inicio, fin, cadena de conexión, base de datos, colección,
+                      columnas, tamaño de lote, campos extra).
+
+    Returns:
+        int: Número de documentos insertados.
+    """
+    (file_path, start, end, connection_string, database_name,
+     collection_name, columns, batch_size, extra_fields) = task
+
+    decode = get_decoder(tuple(columns))
+
+    client = MongoClient(connection_string)
+    with client, open_writer() as writer:
+        collection = client[database_name][collection_name]
+        batch = []
+        inserted = 0
+
+        for line in read_lines(file_path, start, end):
+            # Carga la línea JSON y extrae las columnas especificadas
+            line_json = decode(line)
+            info_json = {column: line_json.get(column, "") for column in columns}
+            info_json["reviewTime"] = parse_review_time(
+                info_json["reviewTime"], info_json["unixReviewTime"]
+            )
+            info_json.update(extra_fields)
+            batch.append(info_json)
+
+            # Enviar el lote al escritor cuando se alcanza el tamaño del lote
+            if len(batch) >= batch_size:
+                writer.put(collection, batch, extra_keys=extra_fields)
+                inserted += len(batch)
+                batch = []
+
+        # Enviar documentos restantes en el último lote
+        if batch:
+            writer.put(collection, batch, extra_keys=extra_fields)
+            inserted += len(batch)
+
+    writer.report(f"{collection_name} {start}-{end}")
+    return inserted
+
+def insert_file_in_chunks(
+    file_path, connection_string, database_name, collection_name, columns,
+    batch_size=1000, num_workers=2, extra_fields=None
+):
+    """
+    Inserta un archivo JSON en una colección MongoDB repartiendo sus rangos de bytes
+    entre varios procesos.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        connection_string (str): Cadena de conexión a MongoDB.
+        database_name (str): Nombre de la base de datos de MongoDB.
+        collection_name (str): Nombre de la colección en la que insertar los datos.
+        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+        num_workers (int): Número de procesos que insertan rangos a la vez.
+        extra_fields (dict, optional): Campos que se añaden a cada documento y que en modo upsert
+                                       forman parte de su clave.
+
+    Returns:
+        int: Número de documentos insertados.
+    """
+    tasks = [
+        (file_path, start, end, connection_string, database_name,
+         collection_name, columns, batch_size, extra_fields or {})
+        for start, end in split_file_ranges(file_path, num_workers)
+    ]
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return sum(executor.map(insert_range, tasks))
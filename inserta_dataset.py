@@ -1,286 +1,384 @@
-"""
-inserta_dataset.py
-
-Bases de Datos - IMAT
-ICAI, Universidad Pontificia Comillas
-
-Integrantes del grupo:
-    - Carlos Martínez
-    - Lydia Ruiz
-
-Descripción:
-Programa que carga la información de un nuevo fichero en las bases de datos previamente existentes.
-"""
-
-import os
-import json
-import pymysql
-from datetime import datetime
-from pymongo import MongoClient
-
-from configuracion import (
-    host,
-    user,
-    password,
-    database_name_SQL,
-    database_name_MongoDB,
-    CONNECTION_STRING
-)
-
-def get_data(file_path):
-    """
-    Lee un archivo JSON y carga los datos en una lista.
-
-    Args:
-        file_path (str): Ruta del archivo JSON.
-
-    Returns:
-        list: Lista de diccionarios que representan los datos cargados desde el archivo JSON.
-    """
-    data = []
-    with open(file_path, "r") as fp: 
-        data = [json.loads(line) for line in fp]
-    return data
-
-def get_table_data(host, user, password, database_name, table_name):
-    """
-    Obtiene los datos de una tabla específica en la base de datos MySQL.
-
-    Args:
-        host (str): Dirección del host de la base de datos MySQL.
-        user (str): Nombre de usuario de la base de datos MySQL.
-        password (str): Contraseña de la base de datos MySQL.
-        database_name (str): Nombre de la base de datos MySQL.
-        table_name (str): Nombre de la tabla de la que seleccionar los datos.
-
-    Returns:
-        list: Lista de tuplas representando las filas recuperadas de la tabla.
-    """
-    connection_mysql = pymysql.connect(host=host, user=user, password=password, database=database_name)
-    with connection_mysql:
-        cursor = connection_mysql.cursor()
-        sql = f"""SELECT * 
-                  FROM {table_name};"""
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        cursor.close()
-
-    return result
-
-def get_new_ids_names(new_data, id_column_name="ID", name_column_name="Name"):
-    """
-    Obtiene los nuevos IDs y nombres de una lista de datos.
-
-    Args:
-        new_data (list): Lista de diccionarios representando los nuevos datos.
-        id_column_name (str, optional): Nombre de la columna que contiene los IDs. Defaults to "ID".
-        name_column_name (str, optional): Nombre de la columna que contiene los nombres. Defaults to "Name".
-
-    Returns:
-        set: Conjunto de tuplas (ID, Nombre) representando los nuevos IDs y nombres.
-    """
-    ids_names_new = {(entry.get(id_column_name, ""), entry.get(name_column_name, "")) for entry in new_data if entry.get(name_column_name)}
-    reviewer_ids_with_name = {reviewer_id for reviewer_id, reviewer_name in ids_names_new if reviewer_name}
-    ids_names_new = {(reviewer_id, reviewer_name) for reviewer_id, reviewer_name in ids_names_new if reviewer_name or reviewer_id not in reviewer_ids_with_name}
-    return ids_names_new
-
-def get_unique_ids_names(old_ids_names, new_ids_names):
-    """
-    Obtiene los IDs y nombres únicos que deben insertarse.
-
-    Args:
-        old_ids_names (list): Lista de tuplas representando los IDs y nombres existentes.
-        new_ids_names (set): Conjunto de tuplas representando los nuevos IDs y nombres.
-
-    Returns:
-        list: Lista de tuplas representando los IDs y nombres únicos que deben insertarse.
-    """
-    old_ids, _ = zip(*old_ids_names)
-    unique_ids_names = [(id, name) for id, name in new_ids_names if id not in old_ids]
-    return unique_ids_names
-
-def get_last_product_id(host, user, password, database_name, table_name):
-    """
-    Obtiene el número de filas de la tabla
-
-    Args:
-        host (str): Dirección del host de la base de datos MySQL.
-        user (str): Nombre de usuario de la base de datos MySQL.
-        password (str): Contraseña de la base de datos MySQL.
-        database_name (str): Nombre de la base de datos MySQL.
-        table_name (str): Nombre de la tabla de la que seleccionar los datos.
-
-    Returns:
-        int: Número de filas de la tabla.
-    """
-    connection_mysql = pymysql.connect(host=host, user=user, password=password, database=database_name)
-    with connection_mysql:
-        cursor = connection_mysql.cursor()
-        sql = f"""SELECT * 
-                  FROM {table_name};"""
-        result = cursor.execute(sql)
-        cursor.close()
-
-    return result
-
-def get_new_asins_types(host, user, password, database_name, table_name, new_data, column_name, type):
-    """
-    Obtiene los nuevos ASINs y tipos de una lista de datos.
-
-    Args:
-        host (str): Dirección del host de la base de datos MySQL.
-        user (str): Nombre de usuario de la base de datos MySQL.
-        password (str): Contraseña de la base de datos MySQL.
-        database_name (str): Nombre de la base de datos MySQL.
-        table_name (str): Nombre de la tabla de la que seleccionar los datos.
-        new_data (list): Lista de diccionarios representando los nuevos datos.
-        column_name (str): Nombre de la columna que contiene los ASINs.
-        type (str): Tipo asociado a los nuevos datos.
-
-    Returns:
-        list: Lista de tuplas representando los nuevos ASINs y tipos.
-    """
-    connection_mysql = pymysql.connect(host=host, user=user, password=password, database=database_name)
-    with connection_mysql:
-        cursor = connection_mysql.cursor()
-        sql = f"""SELECT ID FROM {table_name}"""
-        max_id = cursor.execute(sql)
-        cursor.close()
-   
-    asins_types = list(set((entry.get(column_name, ""), type) for entry in new_data))
-    new_asins_types = []
-    for asin_type in asins_types:
-        max_id += 1
-        new_asin_type = (max_id,) + asin_type
-        new_asins_types.append(new_asin_type)
-
-    return new_asins_types
-
-def insert_new_data_table_sql(host, user, password, database_name, table_name, data_to_insert, column_names):
-    """
-    Inserta datos en una tabla específica de la base de datos MySQL.
-
-    Args:
-        host (str): Dirección del host de la base de datos MySQL.
-        user (str): Nombre de usuario de la base de datos MySQL.
-        password (str): Contraseña de la base de datos MySQL.
-        database_name (str): Nombre de la base de datos MySQL.
-        table_name (str): Nombre de la tabla en la que insertar los datos.
-        data_to_insert (list): Lista de tuplas representando los datos a insertar.
-        column_names (list): Lista de nombres de columnas en la tabla.
-
-    Returns:
-        None
-    """
-    column_names_str = ", ".join(column_names)
-    placeholders = ", ".join(["%s" for _ in range(len(column_names))])
-    connection_mysql = pymysql.connect(host=host, user=user, password=password, database=database_name)
-    with connection_mysql:
-        cursor = connection_mysql.cursor()
-        sql = f"INSERT INTO {table_name} ({column_names_str}) VALUES({placeholders});"
-        cursor.executemany(sql, data_to_insert)
-        connection_mysql.commit()
-        cursor.close()
-
-
-def insert_new_data_sql(host, user, password, data, database_name):
-    """
-    Inserta nuevos datos en una base de datos MySQL.
-
-    Args:
-        host (str): Dirección del host de la base de datos MySQL.
-        user (str): Nombre de usuario de la base de datos MySQL.
-        password (str): Contraseña de la base de datos MySQL.
-        data (list): Lista de diccionarios que representan los datos cargados desde el archivo JSON.
-        database_name (str): Nombre de la base de datos MySQL.
-
-    Returns:
-        None
-    """
-    global REVIEWERS_TABLE, ITEMS_TABLE, PRODUCTS_TABLE, collection_name
-
-    # Obtiene los datos existentes de la tabla de revisores
-    old_ids_names = get_table_data(host, user, password, database_name, REVIEWERS_TABLE)
-    # Obtiene los nuevos IDs y nombres del archivo JSON
-    new_ids_names = get_new_ids_names(data)
-
-    # Obtiene los IDs y nombres únicos que deben insertarse
-    ids_names_to_insert = get_unique_ids_names(old_ids_names, new_ids_names)
-    # Inserta los nuevos IDs y nombres en la tabla de revisores
-    insert_new_data_table_sql(host, user, password, database_name, REVIEWERS_TABLE, ids_names_to_insert, ["ID", "Name"])
-
-    # Obtiene el ID del nuevo tipo de producto
-    new_product_id = get_last_product_id(host, user, password, database_name, PRODUCTS_TABLE)
-    # Inserta el nuevo ID y el nombre del tipo de producto
-    insert_new_data_table_sql(host, user, password, database_name, PRODUCTS_TABLE, [(new_product_id, collection_name)], ["ID", "Type"])
-
-    # Obtiene los nuevos ASINs y tipos del archivo JSON
-    asins_types_to_insert = get_new_asins_types(host, user, password, database_name, ITEMS_TABLE, data, "asin", new_product_id)
-    # Inserta los nuevos ASINs y tipos en la tabla de artículos
-    insert_new_data_table_sql(host, user, password, database_name, ITEMS_TABLE, asins_types_to_insert, ["ID", "asin", "type"])
-    
-def insert_new_data_mongo(data, database, collection_name, columns, batch_size= 1000): 
-    """
-    Inserta los datos de un archivo JSON en una colección MongoDB.
-
-    Args:
-        data (list): Lista de diccionarios que representan los datos cargados desde el archivo JSON.
-        database (pymongo.database.Database): Base de datos de MongoDB.
-        collection_name (str): Nombre de la colección en la que insertar los datos.
-        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
-        batch_size (int): Tamaño del lote para las inserciones por lotes.
-
-    Returns:
-        None
-    """
-    collection = database[collection_name]
-
-    batch = []
-    batch_counter = 0
-
-
-    for line in data:
-        info_json = {column: line.get(column, "") for column in columns}
-        # Convierte la cadena de tiempo a un objeto de fecha
-        info_json["reviewTime"] = datetime.strptime(info_json['reviewTime'], '%m %d, %Y')
-        batch.append(info_json)
-        batch_counter += 1
-
-        # Insertar lote en la base de datos cuando se alcanza el tamaño del lote
-        if batch_counter >= batch_size:
-            collection.insert_many(batch)
-            batch = []  # Reiniciar lote
-            batch_counter = 0  # Reiniciar contador
-
-    # Insertar documentos restantes en el último lote
-    if batch:
-        collection.insert_many(batch)
-
-
-
-if __name__ == "__main__":
-
-    # Ruta del archivo y datos que almacena
-    new_file_path = "Pet_Supplies_5.json"
-    data = get_data(new_file_path)
-
-    # Nombre de base de datos y de la colección
-    collection_name = os.path.basename(new_file_path).replace("_5.json", "")
-
-    # Nombres de tablas de MySQL
-    REVIEWERS_TABLE = "reviewers"
-    ITEMS_TABLE = "items"
-    PRODUCTS_TABLE = "products"
-
-    # Introducir datos en MySQL
-    insert_new_data_sql(host, user, password, data, database_name_SQL)
-
-    # Configuración de la conexión a la base de datos MongoDB
-    client = MongoClient(CONNECTION_STRING)
-    database = client[database_name_MongoDB]
-
-    # Columnas que se van a extraer de los archivos JSON
-    mongo_columns = ["reviewerID", "asin", "helpful", "overall", "summary", "reviewText", "reviewTime", "unixReviewTime"]
-
-    # Introducir datos en MongoDB
-    insert_new_data_mongo(data, database, collection_name, mongo_columns)
\ No newline at end of file
+"""
+inserta_dataset.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa que carga la información de un nuevo fichero en las bases de datos previamente existentes.
+"""
+
+from pymongo import MongoClient
+from ingesta import parse_review_time, get_decoder, read_lines_with_offsets, category_from_filename, open_writer
+from indices import build_mongo_indexes, build_mysql_indexes
+from secuencias import reserve_ids
+from conexion_mysql import get_pool, close_pools
+
+from configuracion import (
+    host,
+    user,
+    password,
+    database_name_SQL,
+    database_name_MongoDB,
+    upsert_mode,
+    CONNECTION_STRING
+)
+
+# Número de filas que se envían a MySQL en cada inserción
+CHUNK_SIZE = 10000
+
+# Columnas que se van a extraer de los archivos JSON
+MONGO_COLUMNS = ["reviewerID", "asin", "helpful", "overall", "summary", "reviewText", "reviewTime", "unixReviewTime"]
+
+# Nombres de tablas de MySQL
+REVIEWERS_TABLE = "reviewers"
+ITEMS_TABLE = "items"
+PRODUCTS_TABLE = "products"
+
+def stream_new_data(
+    file_path, database, collection_name, columns, batch_size=1000, start=0, complete_lines_only=False,
+    upsert=upsert_mode,
+):
+    """
+    Lee una única vez un archivo JSON, insertando sus reviews en MongoDB por lotes y recopilando
+    a la vez los revisores y ASINs que se insertan después en MySQL. La memoria usada no depende
+    del tamaño del archivo, solo del número de revisores y ASINs distintos.
+
+    La lectura puede empezar en un byte distinto del primero, para cargar solo lo que se ha añadido
+    a un archivo desde la última vez.
+
+    Args:
+        file_path (str): Ruta del archivo JSON, comprimido o no.
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        collection_name (str): Nombre de la colección en la que insertar los datos.
+        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+        start (int): Byte desde el que empezar a leer. Debe ser el comienzo de una línea.
+        complete_lines_only (bool): Si es True, se para en la primera línea sin salto de línea
+                                    final, que puede estar todavía escribiéndose.
+        upsert (bool): Si es True, las reviews que ya existen no se vuelven a insertar.
+
+    Returns:
+        tuple: Una tupla (revisores, ASINs, byte final, documentos) con las tuplas (ID, nombre) de
+               los revisores con nombre y los ASINs leídos, ambos sin repetidos y en orden de
+               aparición, el byte hasta el que se ha leído y el número de reviews insertadas.
+    """
+    collection = database[collection_name]
+
+    ids_names = {}  # Primer nombre no vacío de cada revisor
+    asins = {}      # Diccionario usado como conjunto ordenado
+
+    decode = get_decoder(tuple(dict.fromkeys([*columns, "reviewerID", "reviewerName", "asin"])))
+
+    batch = []
+    batch_counter = 0
+    offset = start
+    documents = 0
+
+    # El escritor inserta cada lote en segundo plano mientras se leen los siguientes
+    with open_writer(upsert=upsert) as writer:
+        for line_offset, line in read_lines_with_offsets(file_path, start):
+            if complete_lines_only and not line.endswith(b"\n"):
+                break
+            offset = line_offset + len(line)
+
+            # Si la última línea se cargó sin salto de línea, el que se añade después queda solo
+            if not line.strip():
+                continue
+
+            line_json = decode(line)
+
+            # Datos para MySQL
+            reviewer_name = line_json.get("reviewerName", "")
+            if reviewer_name:
+                ids_names.setdefault(line_json.get("reviewerID", ""), reviewer_name)
+            asins[line_json.get("asin", "")] = None
+
+            # Datos para MongoDB
+            info_json = {column: line_json.get(column, "") for column in columns}
+            # Convierte la cadena de tiempo a un objeto de fecha
+            info_json["reviewTime"] = parse_review_time(info_json['reviewTime'], info_json['unixReviewTime'])
+            batch.append(info_json)
+            batch_counter += 1
+            documents += 1
+
+            # Enviar el lote al escritor cuando se alcanza el tamaño del lote
+            if batch_counter >= batch_size:
+                writer.put(collection, batch)
+                batch = []  # Reiniciar lote
+                batch_counter = 0  # Reiniciar contador
+
+        # Enviar documentos restantes en el último lote
+        if batch:
+            writer.put(collection, batch)
+
+    writer.report(collection_name)
+
+    return list(ids_names.items()), list(asins), offset, documents
+
+def chunks(rows, chunk_size):
+    """
+    Divide una lista de filas en trozos de como mucho 'chunk_size' filas.
+    """
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+def insert_unique_ids_names(cursor, table_name, new_ids_names, chunk_size=CHUNK_SIZE):
+    """
+    Inserta en la tabla de revisores los IDs y nombres que todavía no existen.
+
+    Los revisores del archivo se cargan en una tabla temporal y la comparación con los revisores
+    existentes se hace en el servidor con un anti-join sobre la clave primaria, por lo que el
+    coste crece con el tamaño del archivo nuevo y no hace falta traer la tabla completa.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor de la transacción de la carga.
+        table_name (str): Nombre de la tabla de revisores.
+        new_ids_names (list): Lista de tuplas representando los nuevos IDs y nombres.
+        chunk_size (int): Número de filas que se envían a la tabla temporal en cada inserción.
+
+    Returns:
+        int: Número de revisores insertados.
+    """
+    # Tabla temporal con los revisores del archivo; un mismo ID solo se guarda una vez.
+    # La conexión viene del pool, así que se borra antes por si quedó de una carga fallida
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table_name}_staging;")
+    cursor.execute(
+        f"""CREATE TEMPORARY TABLE {table_name}_staging
+            (ID VARCHAR(100) NOT NULL, Name VARCHAR(100), PRIMARY KEY (ID));"""
+    )
+    for chunk in chunks(new_ids_names, chunk_size):
+        cursor.executemany(
+            f"INSERT IGNORE INTO {table_name}_staging (ID, Name) VALUES (%s, %s);", chunk
+        )
+
+    # Anti-join: solo se insertan los revisores que no están ya en la tabla
+    inserted = cursor.execute(
+        f"""INSERT INTO {table_name} (ID, Name)
+            SELECT s.ID, s.Name
+            FROM {table_name}_staging s
+            LEFT JOIN {table_name} r ON r.ID = s.ID
+            WHERE r.ID IS NULL;"""
+    )
+    cursor.execute(f"DROP TEMPORARY TABLE {table_name}_staging;")
+
+    return inserted
+
+def get_new_asins_types(pool, table_name, asins, type):
+    """
+    Obtiene los nuevos ASINs y tipos a partir de los ASINs de un archivo, con IDs reservados
+    en la secuencia de la tabla para que no coincidan con los de otra carga simultánea.
+
+    Args:
+        pool (ConnectionPool): Pool de conexiones de la base de datos MySQL.
+        table_name (str): Nombre de la tabla de artículos.
+        asins (list): Lista de ASINs del archivo, sin repetidos.
+        type (str): Tipo asociado a los nuevos datos.
+
+    Returns:
+        list: Lista de tuplas representando los nuevos ASINs y tipos.
+    """
+    first_id = reserve_ids(pool, table_name, len(asins), first_value=1)
+
+    return [(first_id + count, asin, type) for count, asin in enumerate(asins)]
+
+def get_product_id(cursor, table_name, type):
+    """
+    Obtiene el ID de un tipo de producto que ya existe en la tabla.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor de la transacción de la carga.
+        table_name (str): Nombre de la tabla de tipos de producto.
+        type (str): Nombre del tipo de producto.
+
+    Returns:
+        int: ID del tipo de producto, o None si no existe.
+    """
+    cursor.execute(f"SELECT ID FROM {table_name} WHERE Type = %s;", (type,))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def get_missing_asins(cursor, table_name, asins, type, chunk_size=CHUNK_SIZE):
+    """
+    Obtiene los ASINs de un archivo que todavía no están en la tabla de artículos con su tipo.
+    Igual que con los revisores, la comparación se hace en el servidor con una tabla temporal y
+    un anti-join. Un mismo ASIN puede estar en varias categorías, con un artículo en cada una.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor de la transacción de la carga.
+        table_name (str): Nombre de la tabla de artículos.
+        asins (list): Lista de ASINs del archivo, sin repetidos.
+        type (int): ID del tipo de producto del archivo.
+        chunk_size (int): Número de filas que se envían a la tabla temporal en cada inserción.
+
+    Returns:
+        list: ASINs que no existen todavía, en el mismo orden que en 'asins'.
+    """
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table_name}_staging;")
+    cursor.execute(
+        f"""CREATE TEMPORARY TABLE {table_name}_staging
+            (Position INT NOT NULL, Asin VARCHAR(100) NOT NULL, PRIMARY KEY (Asin));"""
+    )
+    for chunk in chunks(list(enumerate(asins)), chunk_size):
+        cursor.executemany(
+            f"INSERT IGNORE INTO {table_name}_staging (Position, Asin) VALUES (%s, %s);", chunk
+        )
+
+    cursor.execute(
+        f"""SELECT s.Asin
+            FROM {table_name}_staging s
+            LEFT JOIN {table_name} i ON i.Type = %s AND i.Asin = s.Asin
+            WHERE i.Asin IS NULL
+            ORDER BY s.Position;""",
+        (type,),
+    )
+    missing_asins = [asin for (asin,) in cursor.fetchall()]
+    cursor.execute(f"DROP TEMPORARY TABLE {table_name}_staging;")
+
+    return missing_asins
+
+def insert_new_data_table_sql(cursor, table_name, data_to_insert, column_names, chunk_size=CHUNK_SIZE, ignore=False):
+    """
+    Inserta datos en una tabla específica de la base de datos MySQL, en trozos de 'chunk_size' filas.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor de la transacción de la carga.
+        table_name (str): Nombre de la tabla en la que insertar los datos.
+        data_to_insert (list): Lista de tuplas representando los datos a insertar.
+        column_names (list): Lista de nombres de columnas en la tabla.
+        chunk_size (int): Número de filas que se envían en cada inserción.
+        ignore (bool): Si es True, las filas que repiten una clave única se descartan sin error.
+
+    Returns:
+        int: Número de filas insertadas.
+    """
+    column_names_str = ", ".join(column_names)
+    placeholders = ", ".join(["%s" for _ in range(len(column_names))])
+    insert = "INSERT IGNORE" if ignore else "INSERT"
+    sql = f"{insert} INTO {table_name} ({column_names_str}) VALUES({placeholders});"
+
+    inserted = 0
+    for chunk in chunks(data_to_insert, chunk_size):
+        inserted += cursor.executemany(sql, chunk)
+    return inserted
+
+
+def insert_new_data_sql(host, user, password, ids_names, asins, database_name, collection_name, upsert=upsert_mode):
+    """
+    Inserta nuevos datos en una base de datos MySQL. Todas las inserciones se hacen en una única
+    transacción con una conexión del pool: si alguna falla no queda ningún cambio en la base de datos.
+    Los IDs del tipo de producto y de los artículos se reservan antes de empezarla, cada bloque en
+    su propia transacción corta, para no bloquear las secuencias durante la carga; si la carga
+    falla, esos IDs quedan sin usar.
+
+    En modo upsert el archivo puede estar ya cargado total o parcialmente: se reutiliza el tipo de
+    producto si ya existe, solo se insertan los ASINs que faltan en esa categoría y un índice
+    único sobre ('Type', 'Asin') impide que dos cargas simultáneas inserten el mismo artículo.
+
+    Args:
+        host (str): Dirección del host de la base de datos MySQL.
+        user (str): Nombre de usuario de la base de datos MySQL.
+        password (str): Contraseña de la base de datos MySQL.
+        ids_names (list): Lista de tuplas (ID, nombre) de los revisores del archivo.
+        asins (list): Lista de ASINs del archivo, sin repetidos.
+        database_name (str): Nombre de la base de datos MySQL.
+        collection_name (str): Nombre de la categoría del archivo.
+        upsert (bool): Si es True, se usa el modo upsert.
+
+    Returns:
+        None
+    """
+    pool = get_pool(host, user, password, database_name)
+
+    # El índice se crea antes de la transacción, porque crear un índice confirma la transacción abierta
+    if upsert:
+        # Un mismo ASIN puede estar en varias categorías, así que la clave incluye el tipo
+        build_mysql_indexes(
+            host, user, password, database_name, [(ITEMS_TABLE, "uq_items_type_asin", "Type, Asin")], unique=True
+        )
+
+    # Obtiene el ID del tipo de producto y los ASINs que faltan en esa categoría. Si otra carga
+    # inserta alguno de ellos mientras tanto, el índice único hace que se descarte sin error
+    product_id, new_asins = None, asins
+    if upsert:
+        with pool.connection() as connection_mysql, connection_mysql.cursor() as cursor:
+            product_id = get_product_id(cursor, PRODUCTS_TABLE, collection_name)
+            if product_id is not None:
+                new_asins = get_missing_asins(cursor, ITEMS_TABLE, asins, product_id)
+
+    # Reserva los IDs del tipo de producto, si no existe, y de los nuevos artículos
+    new_product = product_id is None
+    if new_product:
+        product_id = reserve_ids(pool, PRODUCTS_TABLE, 1, first_value=0)
+    asins_types_to_insert = get_new_asins_types(pool, ITEMS_TABLE, new_asins, product_id)
+
+    with pool.transaction() as cursor:
+        # Inserta en la tabla de revisores solo los IDs que no existen todavía
+        reviewers_inserted = insert_unique_ids_names(cursor, REVIEWERS_TABLE, ids_names)
+
+        # Inserta el nuevo ID y el nombre del tipo de producto
+        if new_product:
+            insert_new_data_table_sql(cursor, PRODUCTS_TABLE, [(product_id, collection_name)], ["ID", "Type"])
+
+        # Inserta los nuevos ASINs y tipos en la tabla de artículos
+        items_inserted = insert_new_data_table_sql(
+            cursor, ITEMS_TABLE, asins_types_to_insert, ["ID", "asin", "type"], ignore=upsert
+        )
+
+    print(f"[MySQL] {REVIEWERS_TABLE}: {reviewers_inserted} insertados, {len(ids_names) - reviewers_inserted} ya existían")
+    print(f"[MySQL] {ITEMS_TABLE}: {items_inserted} insertados, {len(asins) - items_inserted} ya existían")
+
+def ingest_new_file(file_path, database, start=0, upsert=upsert_mode, complete_lines_only=False, batch_size=1000):
+    """
+    Carga un archivo de reviews en MongoDB y MySQL: primero inserta las reviews en la colección
+    de su categoría y después los revisores, el tipo de producto y los artículos.
+
+    Las reviews se insertan en MongoDB (con sus recuentos y generaciones) mientras se lee el
+    archivo, antes de la transacción de MySQL. Si MySQL falla, solo se deshace su transacción y
+    MongoDB queda por delante: para repetir la carga sin duplicar reviews hay que usar el modo
+    upsert, como hace daemon_ingesta.py.
+
+    Args:
+        file_path (str): Ruta del archivo JSON, comprimido o no.
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        start (int): Byte desde el que empezar a leer.
+        upsert (bool): Si es True, se usa el modo upsert en MongoDB y en MySQL, de forma que
+                       volver a cargar una parte del archivo no duplica datos.
+        complete_lines_only (bool): Si es True, no se lee una última línea incompleta.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+
+    Returns:
+        tuple: Una tupla (byte final, documentos) con el byte hasta el que se ha cargado el archivo
+               y el número de reviews insertadas.
+    """
+    collection_name = category_from_filename(file_path)
+
+    # Lee el archivo una sola vez: inserta en MongoDB y obtiene los revisores y ASINs
+    ids_names, asins, offset, documents = stream_new_data(
+        file_path, database, collection_name, MONGO_COLUMNS, batch_size, start, complete_lines_only, upsert
+    )
+
+    # Introducir datos en MySQL
+    if documents:
+        insert_new_data_sql(host, user, password, ids_names, asins, database_name_SQL, collection_name, upsert)
+
+    return offset, documents
+
+if __name__ == "__main__":
+
+    # Ruta del archivo
+    new_file_path = "Pet_Supplies_5.json"
+
+    # Configuración de la conexión a la base de datos MongoDB
+    client = MongoClient(CONNECTION_STRING)
+    database = client[database_name_MongoDB]
+
+    ingest_new_file(new_file_path, database)
+    close_pools()
+
+    # Índices que necesitan las consultas, creados una vez insertados los datos
+    build_mongo_indexes(database, [category_from_filename(new_file_path)])
@@ -1,252 +1,800 @@
-"""
-load_data.py
-
-Bases de Datos - IMAT
-ICAI, Universidad Pontificia Comillas
-
-Integrantes del grupo:
-    - Carlos Martínez
-    - Lydia Ruiz
-
-Descripción:
-Programa que carga toda la infraestructura de los datos tanto en MySQL como en MongoDB.
-"""
-
-from configuracion import (
-    host,
-    user,
-    password,
-    database_name_SQL,
-    database_name_MongoDB,
-    CONNECTION_STRING,
-    folder_path,
-)
-
-import os
-import json
-import pymysql
-from datetime import datetime
-from pymongo import MongoClient
-
-
-from typing import List
-
-
-def create_database(host: str, user: str, password: str, database_name: str, collections_columns: List):
-    """
-    Crea una base de datos MySQL y las tablas especificadas si no existen.
-
-    Args:
-        host (str): Dirección del servidor MySQL.
-        user (str): Nombre de usuario de MySQL.
-        password (str): Contraseña de MySQL.
-        database_name (str): Nombre de la base de datos a crear.
-        collections_columns (List): Lista de tuplas que contienen la información de las tablas.
-                                    Cada tupla debe tener el nombre de la tabla, una lista de tuplas
-                                    con los nombres y tipos de columnas, y el nombre de la columna
-                                    primaria y su tipo.
-
-    Returns:
-        None
-    """
-    connection_mysql = pymysql.connect(host=host, user=user, password=password)
-    with connection_mysql:
-        cursor = connection_mysql.cursor()
-
-        # Crea la base de datos
-        cursor.execute(f"CREATE DATABASE {database_name}")
-        cursor.execute(f"USE {database_name}")
-
-        # Crea cada tabla 
-        for collection in collections_columns:
-            table_name, columns, keys = collection
-            table_keys = ", ".join(keys)
-
-            # Define la estructura de la tabla
-            column_definitions = ", ".join(f"{name} {type}" for name, type in columns)
-            sql = f"""CREATE TABLE {table_name} ({column_definitions}, {table_keys});"""
-
-            cursor.execute(sql)
-
-def insert_data(host: str, user: str, password: str, database_name: str, collections_columns: List, data: List[List]):
-    """
-    Inserta datos en las tablas de la base de datos.
-
-    Args:
-        host (str): Dirección del servidor MySQL.
-        user (str): Nombre de usuario de MySQL.
-        password (str): Contraseña de MySQL.
-        database_name (str): Nombre de la base de datos.
-        collections_columns (List): Lista de tuplas que contienen la información de las tablas.
-                                    Cada tupla debe tener el nombre de la tabla y una lista de tuplas
-                                    con los nombres y tipos de columnas.
-        data (List[List]): Lista de datos a insertar en las tablas. Cada lista interna contiene
-                            los datos correspondientes a una tabla.
-
-    Returns:
-        None
-    """
-    connection_mysql = pymysql.connect(host=host, user=user, password=password, database=database_name)
-    with connection_mysql:
-        cursor = connection_mysql.cursor()
-
-        # Inserta los datos en las tablas
-        for collection, collection_data in zip(collections_columns, data):
-            table_name, columns, _ = collection
-
-            # Construye la consulta SQL para insertar los datos
-            column_names = ", ".join(name for name, _ in columns)
-            placeholders = ", ".join(["%s"] * len(columns))
-
-            sql = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders});"
-            
-            # Ejecuta la consulta SQL con los datos correspondientes
-            cursor.executemany(sql, collection_data)
-
-        # Confirma los cambios en la base de datos
-        connection_mysql.commit()
-        cursor.close()
-
-def obtain_data_sql(folder_path: str):
-    """
-    Función para obtener los tipos, nombres e IDs de varios ficheros.
-
-    Args:
-        folder_path (str): Ruta de la carpeta que contiene los ficheros.
-
-    Returns:
-        tuple: Una tupla conteniendo tres listas: la lista de IDs, la lista de tipos de productos 
-              y la lista de ASINs.
-    """
-    
-    ids = []
-    asins = []
-
-    seen_ids = set()    # Conjunto para rastrear IDs únicos
-    cont_ids_asins = 1  # Contador para rastrear asins únicos
-    
-    # Obtener los nombres de los archivos en la carpeta y 
-    # crear diccionario para mapear el tipo de cada archivo 
-    files_list = os.listdir(folder_path)
-    types_dict = {count: value.replace("_5.json", "") for count, value in enumerate(files_list)}
-    types_list = list(types_dict.items())
-
-    # Iterar sobre cada archivo en la lista
-    for count, file in enumerate(files_list):
-        path_file = os.path.join(folder_path, file)
-
-        file_asins = []
-
-        seen_asins = set()
-
-        # Abrir el archivo y leer cada línea
-        with open(path_file, mode="r") as fp:
-            for line in fp:
-                line_json = json.loads(line)
-
-                # Obtener el ID y el ASIN de la línea
-                id = line_json.get("reviewerID", "")
-                name = line_json.get("reviewerName", "")
-                asin = line_json.get("asin", "")
-                
-                # Si el ID es nuevo, agregarlo a la lista de IDs
-                if id not in seen_ids and name != "":
-                    ids.append((id, name))
-                    seen_ids.add(id)
-
-                # Si el ASIN es nuevo, agregarlo a la lista de ASINs
-                if asin not in seen_asins:
-                    file_asins.append((cont_ids_asins, asin, count))
-                    seen_asins.add(asin)
-                    cont_ids_asins += 1
-
-        # Agregar los ASINs únicos del archivo a la lista de ASINs total
-        asins += file_asins
-
-    return ids, types_list, asins
-
-def insert_collection_data(
-    file_path, database_name_MongoDB, collection_name, columns, batch_size=1000
-):
-    """
-    Inserta los datos de un archivo JSON en una colección MongoDB.
-
-    Args:
-        file_path (str): Ruta del archivo JSON.
-        database_name_MongoDB (pymongo.database.Database): Base de datos de MongoDB.
-        collection_name (str): Nombre de la colección en la que insertar los datos.
-        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
-        batch_size (int): Tamaño del lote para las inserciones por lotes.
-
-    Returns:
-        None
-    """
-    # Obtiene la colección en la base de datos
-    collection = database_name_MongoDB[collection_name]
-    batch = []
-    batch_counter = 0
-
-    # Abre el archivo JSON y procesa cada línea
-    with open(file_path, "r") as fp:
-        for line in fp:
-            # Carga la línea JSON y extrae las columnas especificadas
-            line_json = json.loads(line)
-            info_json = {column: line_json.get(column, "") for column in columns}
-            info_json["reviewTime"] = datetime.strptime(
-                info_json["reviewTime"], "%m %d, %Y"
-            )
-            batch.append(info_json)
-            batch_counter += 1
-
-            # Insertar lote en la base de datos cuando se alcanza el tamaño del lote
-            if batch_counter >= batch_size:
-                collection.insert_many(batch)
-                batch = []  # Reiniciar lote
-                batch_counter = 0  # Reiniciar contador
-
-        # Insertar documentos restantes en el último lote
-        if batch:
-            collection.insert_many(batch)
-
-
-if __name__ == "__main__":
-
-   
-
-    collections_columns = [
-    ("Reviewers", [("ID", "VARCHAR(100)"), ("Name", "VARCHAR(100)")], ["PRIMARY KEY (ID)"]),
-    ("Products", [("ID", "INT"), ("Type", "VARCHAR(100)")], ["PRIMARY KEY (ID)"]),
-    ("Items", [("ID", "INT"), ("Asin", "VARCHAR(100)"), ("Type", "INT")], ["PRIMARY KEY (ID)", "FOREIGN KEY (Type) REFERENCES PRODUCTS(ID)"]),
-]
-
-    create_database(host, user, password, database_name_SQL, collections_columns)
-
-    data = obtain_data_sql(folder_path)
-    insert_data(host, user, password, database_name_SQL, collections_columns, data)
-
-    # Configuración de la conexión a la base de datos MongoDB
-    client = MongoClient(CONNECTION_STRING)
-
-    database = client[database_name_MongoDB]
-
-    files_list = os.listdir(folder_path)
-
-    # Columnas que se van a extraer de los archivos JSON
-    columns = [
-        "reviewerID",
-        "asin",
-        "helpful",
-        "overall",
-        "summary",
-        "reviewText",
-        "reviewTime",
-        "unixReviewTime",
-    ]
-
-    # Itera sobre cada archivo JSON en la carpeta
-    for file in files_list:
-        file_path = os.path.join(folder_path, file)
-        collection_name = os.path.basename(file_path).replace("_5.json", "")
-
-        # Inserta los datos del archivo en la colección correspondiente
-        insert_collection_data(file_path, database, collection_name, columns)
+"""
+load_data.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa que carga toda la infraestructura de los datos tanto en MySQL como en MongoDB.
+"""
+
+from configuracion import (
+    host,
+    user,
+    password,
+    database_name_SQL,
+    database_name_MongoDB,
+    database_name_MongoDB_PBi,
+    collection_name_PBi,
+    load_PBi,
+    num_workers,
+    mysql_bulk_load,
+    checkpoint_path,
+    mongo_queue_size,
+    CONNECTION_STRING,
+    folder_path,
+)
+
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pymongo import MongoClient
+from ingesta import (
+    read_lines,
+    read_lines_with_offsets,
+    split_file_ranges,
+    insert_file_in_chunks,
+    parse_review_time,
+    get_decoder,
+    open_review_file,
+    category_from_filename,
+    open_writer,
+    after_batch,
+)
+from escritura_mongo import PipelinedWriter
+from checkpoints import CheckpointJournal
+from conexion_mysql import get_pool, close_pools
+from secuencias import reserve_ids
+from indices import build_mongo_indexes, build_mysql_indexes
+
+
+from typing import List
+
+# Secuencia de IDs de los artículos, compartida con inserta_dataset.py
+ITEMS_SEQUENCE = "items"
+
+
+def split_keys(keys: List):
+    """
+    Separa la clave primaria de una tabla del resto de claves (índices secundarios y claves ajenas).
+
+    Args:
+        keys (List): Lista de definiciones de claves de la tabla.
+
+    Returns:
+        tuple: Una tupla con dos listas: las claves primarias y las claves secundarias.
+    """
+    primary_keys = [key for key in keys if key.upper().startswith("PRIMARY KEY")]
+    secondary_keys = [key for key in keys if not key.upper().startswith("PRIMARY KEY")]
+    return primary_keys, secondary_keys
+
+def create_database(
+    host: str, user: str, password: str, database_name: str, collections_columns: List,
+    defer_secondary_keys: bool = False, if_not_exists: bool = False
+):
+    """
+    Crea una base de datos MySQL y las tablas especificadas si no existen.
+
+    Con 'defer_secondary_keys' las tablas se crean solo con su clave primaria y el resto de
+    claves se añaden con 'add_secondary_keys' cuando ha terminado la carga.
+
+    Args:
+        host (str): Dirección del servidor MySQL.
+        user (str): Nombre de usuario de MySQL.
+        password (str): Contraseña de MySQL.
+        database_name (str): Nombre de la base de datos a crear.
+        collections_columns (List): Lista de tuplas que contienen la información de las tablas.
+                                    Cada tupla debe tener el nombre de la tabla, una lista de tuplas
+                                    con los nombres y tipos de columnas, y el nombre de la columna
+                                    primaria y su tipo.
+        defer_secondary_keys (bool): Si es True, no se crean las claves secundarias.
+        if_not_exists (bool): Si es True, no falla si la base de datos o las tablas ya existen.
+                              Se usa al reanudar una carga interrumpida.
+
+    Returns:
+        None
+    """
+    if_not_exists_sql = "IF NOT EXISTS " if if_not_exists else ""
+
+    # La base de datos todavía no existe, por lo que se usa una conexión sin base de datos
+    with get_pool(host, user, password).connection() as connection_mysql, connection_mysql.cursor() as cursor:
+        # Crea la base de datos
+        cursor.execute(f"CREATE DATABASE {if_not_exists_sql}{database_name}")
+        cursor.execute(f"USE {database_name}")
+
+        # Crea cada tabla 
+        for collection in collections_columns:
+            table_name, columns, keys = collection
+            if defer_secondary_keys:
+                keys, _ = split_keys(keys)
+            table_keys = ", ".join(keys)
+
+            # Define la estructura de la tabla
+            column_definitions = ", ".join(f"{name} {type}" for name, type in columns)
+            sql = f"""CREATE TABLE {if_not_exists_sql}{table_name} ({column_definitions}, {table_keys});"""
+
+            cursor.execute(sql)
+
+def add_secondary_keys(cursor, collections_columns: List):
+    """
+    Añade a las tablas las claves secundarias que no se crearon al crear la base de datos.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor conectado a la base de datos.
+        collections_columns (List): Lista de tuplas que contienen la información de las tablas.
+
+    Returns:
+        None
+    """
+    for table_name, _, keys in collections_columns:
+        _, secondary_keys = split_keys(keys)
+        for key in secondary_keys:
+            cursor.execute(f"ALTER TABLE {table_name} ADD {key};")
+
+def report_rows_per_second(table_name: str, rows: int, seconds: float, method: str):
+    """
+    Muestra por pantalla la velocidad de carga de una tabla.
+    """
+    rate = rows / seconds if seconds > 0 else float("inf")
+    print(f"[MySQL] {table_name}: {rows} filas en {seconds:.2f} s ({rate:.0f} filas/s) con {method}")
+
+def insert_data(host: str, user: str, password: str, database_name: str, collections_columns: List, data: List[List]):
+    """
+    Inserta datos en las tablas de la base de datos.
+
+    Args:
+        host (str): Dirección del servidor MySQL.
+        user (str): Nombre de usuario de MySQL.
+        password (str): Contraseña de MySQL.
+        database_name (str): Nombre de la base de datos.
+        collections_columns (List): Lista de tuplas que contienen la información de las tablas.
+                                    Cada tupla debe tener el nombre de la tabla y una lista de tuplas
+                                    con los nombres y tipos de columnas.
+        data (List[List]): Lista de datos a insertar en las tablas. Cada lista interna contiene
+                            los datos correspondientes a una tabla.
+
+    Returns:
+        None
+    """
+    with get_pool(host, user, password, database_name).transaction() as cursor:
+        # Inserta los datos en las tablas
+        for collection, collection_data in zip(collections_columns, data):
+            table_name, columns, _ = collection
+
+            # Construye la consulta SQL para insertar los datos
+            column_names = ", ".join(name for name, _ in columns)
+            placeholders = ", ".join(["%s"] * len(columns))
+
+            sql = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders});"
+            
+            # Ejecuta la consulta SQL con los datos correspondientes
+            start = time.perf_counter()
+            cursor.executemany(sql, collection_data)
+            report_rows_per_second(table_name, len(collection_data), time.perf_counter() - start, "executemany")
+
+def escape_tsv_value(value):
+    """
+    Escapa un valor para escribirlo en un fichero TSV con el formato por defecto de LOAD DATA.
+
+    Args:
+        value: Valor de la columna.
+
+    Returns:
+        str: Valor escapado. None se escribe como \\N (NULL en MySQL).
+    """
+    if value is None:
+        return "\\N"
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\0", "\\0")
+    )
+
+def write_tsv(rows, fp):
+    """
+    Escribe las filas de una tabla en un fichero TSV, una fila por línea.
+
+    Args:
+        rows (iterable): Tuplas con los valores de cada fila.
+        fp (file): Fichero abierto en modo texto.
+
+    Returns:
+        int: Número de filas escritas.
+    """
+    count = 0
+    for row in rows:
+        fp.write("\t".join(escape_tsv_value(value) for value in row))
+        fp.write("\n")
+        count += 1
+    return count
+
+def insert_data_bulk(host: str, user: str, password: str, database_name: str, collections_columns: List, data: List[List]):
+    """
+    Inserta datos en las tablas de la base de datos con LOAD DATA LOCAL INFILE.
+
+    Los datos de cada tabla se vuelcan a un fichero TSV temporal que carga el propio servidor,
+    lo que es mucho más rápido que insertar las filas una a una. Durante la carga se desactivan
+    las comprobaciones de claves ajenas y de unicidad, y al terminar se añaden las claves
+    secundarias, por lo que la base de datos debe crearse con 'defer_secondary_keys'.
+
+    Args:
+        host (str): Dirección del servidor MySQL.
+        user (str): Nombre de usuario de MySQL.
+        password (str): Contraseña de MySQL.
+        database_name (str): Nombre de la base de datos.
+        collections_columns (List): Lista de tuplas que contienen la información de las tablas.
+        data (List[List]): Lista de datos a insertar en las tablas. Cada lista interna contiene
+                            los datos correspondientes a una tabla.
+
+    Returns:
+        None
+    """
+    pool = get_pool(host, user, password, database_name, local_infile=True)
+    with pool.transaction() as cursor:
+        # Las comprobaciones se hacen una sola vez al añadir las claves al final
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
+        cursor.execute("SET UNIQUE_CHECKS = 0;")
+
+        # Las variables de sesión se restauran aunque falle la carga, porque la conexión vuelve al pool
+        try:
+            for collection, collection_data in zip(collections_columns, data):
+                table_name, columns, _ = collection
+                column_names = ", ".join(name for name, _ in columns)
+
+                # Vuelca las filas a un fichero TSV temporal
+                with tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", newline="\n", suffix=".tsv", delete=False
+                ) as fp:
+                    rows = write_tsv(collection_data, fp)
+
+                try:
+                    start = time.perf_counter()
+                    cursor.execute(
+                        f"""LOAD DATA LOCAL INFILE %s INTO TABLE {table_name}
+                            CHARACTER SET utf8mb4
+                            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                            LINES TERMINATED BY '\\n'
+                            ({column_names});""",
+                        (fp.name,),
+                    )
+                    report_rows_per_second(table_name, rows, time.perf_counter() - start, "LOAD DATA")
+                finally:
+                    os.remove(fp.name)
+        finally:
+            cursor.execute("SET UNIQUE_CHECKS = 1;")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
+
+        # Añade las claves secundarias una vez cargados los datos
+        start = time.perf_counter()
+        add_secondary_keys(cursor, collections_columns)
+        print(f"[MySQL] Claves secundarias añadidas en {time.perf_counter() - start:.2f} s")
+
+def list_data_files(folder_path):
+    """
+    Obtiene los archivos de datos de una carpeta en orden alfabético, de forma que los IDs
+    de los tipos y de los artículos sean los mismos en todas las ejecuciones.
+
+    Args:
+        folder_path (str): Ruta de la carpeta que contiene los ficheros.
+
+    Returns:
+        list: Lista ordenada con los nombres de los archivos.
+    """
+    return sorted(os.listdir(folder_path))
+
+def insert_collection_data(
+    file_path, database_name_MongoDB, collection_name, columns, batch_size=1000,
+    num_workers=1, connection_string=CONNECTION_STRING
+):
+    """
+    Inserta los datos de un archivo JSON en una colección MongoDB.
+
+    Con 'num_workers' mayor que 1 el archivo se divide en rangos de bytes alineados con los
+    saltos de línea y cada rango se procesa e inserta en un proceso distinto.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        database_name_MongoDB (pymongo.database.Database): Base de datos de MongoDB.
+        collection_name (str): Nombre de la colección en la que insertar los datos.
+        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+        num_workers (int): Número de procesos que insertan rangos del archivo a la vez.
+        connection_string (str): Cadena de conexión a MongoDB que usan los procesos.
+
+    Returns:
+        None
+    """
+    if num_workers > 1:
+        insert_file_in_chunks(
+            file_path, connection_string, database_name_MongoDB.name, collection_name,
+            columns, batch_size, num_workers
+        )
+        return
+
+    # Obtiene la colección en la base de datos
+    collection = database_name_MongoDB[collection_name]
+    batch = []
+    batch_counter = 0
+
+    decode = get_decoder(tuple(columns))
+
+    # Abre el archivo JSON y procesa cada línea mientras el escritor inserta los lotes anteriores
+    with open_review_file(file_path) as fp, open_writer() as writer:
+        for line in fp:
+            # Carga la línea JSON y extrae las columnas especificadas
+            line_json = decode(line)
+            info_json = {column: line_json.get(column, "") for column in columns}
+            info_json["reviewTime"] = parse_review_time(
+                info_json["reviewTime"], info_json["unixReviewTime"]
+            )
+            batch.append(info_json)
+            batch_counter += 1
+
+            # Enviar el lote al escritor cuando se alcanza el tamaño del lote
+            if batch_counter >= batch_size:
+                writer.put(collection, batch)
+                batch = []  # Reiniciar lote
+                batch_counter = 0  # Reiniciar contador
+
+        # Enviar documentos restantes en el último lote
+        if batch:
+            writer.put(collection, batch)
+
+    writer.report(collection_name)
+
+
+def ingest_file(file_path, collections, columns, batch_size=1000, start=0, end=None):
+    """
+    Lee una única vez un archivo JSON (o un rango de bytes de él) y reparte cada review entre
+    las colecciones de MongoDB indicadas, recopilando a la vez los revisores y ASINs que necesita MySQL.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        collections (list): Lista de tuplas (colección, campos extra) en las que insertar cada
+                            documento. Los campos extra (dict) se añaden a cada documento de esa
+                            colección, por ejemplo el 'type' de la colección de PowerBI, y en
+                            modo upsert forman parte de la clave de sus documentos.
+        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+        start (int): Byte de inicio del rango a leer.
+        end (int, optional): Byte de fin del rango a leer. Si es None se lee hasta el final.
+
+    Returns:
+        tuple: Una tupla con dos listas: los pares (ID, nombre) de los revisores del rango
+               y los ASINs únicos del rango, ambos en orden de aparición.
+    """
+    file_reviewers = []
+    file_asins = []
+
+    seen_ids = set()    # Conjunto para rastrear IDs únicos del archivo
+    seen_asins = set()  # Conjunto para rastrear ASINs únicos del archivo
+
+    batches = [[] for _ in collections]
+    batch_counter = 0
+
+    # Se decodifican las columnas de MongoDB más el nombre del revisor para MySQL
+    decode = get_decoder(tuple(dict.fromkeys([*columns, "reviewerID", "reviewerName", "asin"])))
+
+    # Procesa cada línea del archivo una sola vez mientras el escritor inserta los lotes anteriores
+    with open_writer() as writer:
+        for line in read_lines(file_path, start, end):
+            line_json = decode(line)
+
+            # Datos para MySQL: revisores y ASINs nuevos
+            id = line_json.get("reviewerID", "")
+            name = line_json.get("reviewerName", "")
+            asin = line_json.get("asin", "")
+
+            if id not in seen_ids and name != "":
+                file_reviewers.append((id, name))
+                seen_ids.add(id)
+
+            if asin not in seen_asins:
+                file_asins.append(asin)
+                seen_asins.add(asin)
+
+            # Datos para MongoDB: un documento por colección destino
+            info_json = {column: line_json.get(column, "") for column in columns}
+            info_json["reviewTime"] = parse_review_time(
+                info_json["reviewTime"], info_json["unixReviewTime"]
+            )
+            for batch, (_, extra_fields) in zip(batches, collections):
+                batch.append(dict(info_json, **extra_fields))
+            batch_counter += 1
+
+            # Enviar los lotes al escritor cuando se alcanza el tamaño del lote
+            if batch_counter >= batch_size:
+                for batch, (collection, extra_fields) in zip(batches, collections):
+                    writer.put(collection, batch, extra_keys=extra_fields)
+                batches = [[] for _ in collections]  # Reiniciar lotes
+                batch_counter = 0  # Reiniciar contador
+
+        # Enviar documentos restantes en el último lote
+        if batch_counter:
+            for batch, (collection, extra_fields) in zip(batches, collections):
+                writer.put(collection, batch, extra_keys=extra_fields)
+
+    label = os.path.basename(file_path) if end is None else f"{os.path.basename(file_path)} {start}-{end}"
+    writer.report(label)
+
+    return file_reviewers, file_asins
+
+def merge_sql_dimensions(types_list, files_data):
+    """
+    Combina los revisores y ASINs obtenidos de cada archivo en las tablas de MySQL,
+    asignando los IDs de los artículos en el orden de los archivos.
+
+    Args:
+        types_list (list): Lista de tuplas (ID, tipo) de cada archivo.
+        files_data (list): Lista con los resultados de 'ingest_file' de cada archivo, en el mismo
+                           orden que 'types_list'. Cada elemento es la lista de resultados de los
+                           rangos del archivo, en orden.
+
+    Returns:
+        tuple: Una tupla conteniendo tres listas, a partir de los revisores y ASINs que devuelve
+              'ingest_file': los revisores (ID, nombre) sin repetidos, los tipos de productos
+              (ID, tipo) y los artículos (ID, ASIN, ID del tipo).
+    """
+    ids = []
+    asins = []
+
+    seen_ids = set()    # Conjunto para rastrear IDs únicos entre archivos
+    cont_ids_asins = 1  # Contador para rastrear asins únicos
+
+    for (type_id, _), file_ranges in zip(types_list, files_data):
+        seen_asins = set()  # Un mismo ASIN puede aparecer en varios rangos del archivo
+
+        for file_reviewers, file_asins in file_ranges:
+            for id, name in file_reviewers:
+                if id not in seen_ids:
+                    ids.append((id, name))
+                    seen_ids.add(id)
+
+            for asin in file_asins:
+                if asin not in seen_asins:
+                    asins.append((cont_ids_asins, asin, type_id))
+                    seen_asins.add(asin)
+                    cont_ids_asins += 1
+
+    return ids, types_list, asins
+
+def _ingest_file_task(task):
+    """
+    Carga un archivo abriendo su propia conexión a MongoDB. Se usa tanto en modo secuencial
+    como dentro de los procesos del pool, ya que los clientes de MongoDB no pueden compartirse
+    entre procesos.
+
+    Args:
+        task (tuple): Tupla (ruta, inicio, fin, tipo, cadena de conexión, base de datos, destino
+                      de PowerBI, columnas, tamaño de lote). El destino de PowerBI es una tupla
+                      (base de datos, colección) o None.
+
+    Returns:
+        tuple: Resultado de 'ingest_file' para el rango del archivo.
+    """
+    (file_path, start, end, file_type, connection_string,
+     database_name, target_PBi, columns, batch_size) = task
+
+    client = MongoClient(connection_string)
+    with client:
+        # Colección de la categoría y, si procede, colección de PowerBI con su columna 'type'
+        collections = [(client[database_name][file_type], {})]
+        if target_PBi is not None:
+            database_name_PBi, collection_name = target_PBi
+            collections.append((client[database_name_PBi][collection_name], {"type": file_type}))
+
+        return ingest_file(file_path, collections, columns, batch_size, start, end)
+
+def ingest_folder(
+    folder_path, connection_string, database_name, columns, target_PBi=None, batch_size=1000, num_workers=1
+):
+    """
+    Carga todos los archivos de una carpeta en MongoDB leyendo cada línea una sola vez y
+    obtiene en la misma pasada los datos de las tablas de MySQL.
+
+    Con 'num_workers' mayor que 1 cada archivo se divide en rangos de bytes alineados con los
+    saltos de línea y cada rango se procesa en su propio proceso, de forma que incluso un único
+    archivo grande aprovecha todos los núcleos. Los revisores y ASINs de cada rango se combinan
+    después en el orden de los archivos y de los rangos, por lo que la deduplicación y los IDs de
+    los artículos no dependen del orden en que terminen los procesos.
+
+    Args:
+        folder_path (str): Ruta de la carpeta que contiene los ficheros.
+        connection_string (str): Cadena de conexión a MongoDB.
+        database_name (str): Base de datos de MongoDB con una colección por categoría.
+        columns (list): Lista de nombres de columnas a extraer de los archivos JSON.
+        target_PBi (tuple, optional): Tupla (base de datos, colección) de PowerBI. Si se indica,
+                                      cada review se inserta también en ella.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+        num_workers (int): Número de procesos que cargan archivos a la vez.
+
+    Returns:
+        tuple: Una tupla conteniendo tres listas: la lista de IDs, la lista de tipos de productos 
+              y la lista de ASINs, lista para 'insert_data'.
+    """
+    files_list = list_data_files(folder_path)
+    types_list = [(count, category_from_filename(file)) for count, file in enumerate(files_list)]
+
+    if num_workers > 1:
+        # Cada archivo se reparte en tantos rangos como procesos
+        tasks = []
+        for count, (file, (_, file_type)) in enumerate(zip(files_list, types_list)):
+            file_path = os.path.join(folder_path, file)
+            for start, end in split_file_ranges(file_path, num_workers):
+                tasks.append((count, (file_path, start, end, file_type, connection_string,
+                                      database_name, target_PBi, columns, batch_size)))
+
+        # 'map' devuelve los resultados en el orden de los archivos y de los rangos
+        files_data = [[] for _ in files_list]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = executor.map(_ingest_file_task, [task for _, task in tasks])
+            for (count, _), result in zip(tasks, results):
+                files_data[count].append(result)
+    else:
+        files_data = [
+            [_ingest_file_task((os.path.join(folder_path, file), 0, None, file_type, connection_string,
+                                database_name, target_PBi, columns, batch_size))]
+            for file, (_, file_type) in zip(files_list, types_list)
+        ]
+
+    return merge_sql_dimensions(types_list, files_data)
+
+def insert_sql_batch(cursor, reviewers, items):
+    """
+    Inserta un lote de revisores y artículos ignorando las filas que ya existen, de forma
+    que repetir un lote tras una interrupción no duplica datos.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor conectado a la base de datos.
+        reviewers (list): Lista de tuplas (ID, nombre) de revisores.
+        items (list): Lista de tuplas (ID, ASIN, tipo) de artículos.
+
+    Returns:
+        None
+    """
+    cursor.executemany("INSERT IGNORE INTO Reviewers (ID, Name) VALUES (%s, %s);", reviewers)
+    cursor.executemany("INSERT IGNORE INTO Items (ID, Asin, Type) VALUES (%s, %s, %s);", items)
+
+def put_mongo_batches(writer, collections, batches, on_done):
+    """
+    Envía al escritor el lote de cada colección. La función 'on_done' se asocia al último lote,
+    que con un único hilo escritor es el último en insertarse.
+    """
+    for count, (batch, (collection, _)) in enumerate(zip(batches, collections)):
+        writer.put(collection, batch, on_done if count == len(collections) - 1 else None)
+
+def ingest_file_checkpointed(
+    file_path, type_id, collections, columns, pool, connection_mysql, journal, batch_size=1000
+):
+    """
+    Carga un archivo en MySQL y MongoDB confirmando cada lote en el diario de puntos de control.
+
+    Si el archivo ya tiene progreso en el diario, la lectura continúa desde el byte confirmado
+    en cada destino. Los documentos de MongoDB reciben un '_id' determinista (categoría y byte
+    de la línea) y las filas de MySQL se insertan con INSERT IGNORE, por lo que los lotes que se
+    repiten tras una interrupción no generan duplicados. Los IDs de los artículos nuevos se
+    reservan por bloques en la tabla de secuencias, igual que en inserta_dataset.py.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        type_id (int): ID del tipo de producto del archivo.
+        collections (list): Lista de tuplas (colección, campos extra) en las que insertar cada documento.
+        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
+        pool (ConnectionPool): Pool de conexiones de MySQL, para reservar los IDs.
+        connection_mysql (pymysql.connections.Connection): Conexión a la base de datos MySQL.
+        journal (CheckpointJournal): Diario de puntos de control.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+
+    Returns:
+        None
+    """
+    file_name = os.path.basename(file_path)
+    category = category_from_filename(file_path)
+
+    checkpoint = journal.get(file_name)
+    if checkpoint["done"]:
+        return
+
+    mysql_offset, mysql_batch = checkpoint["mysql"]["offset"], checkpoint["mysql"]["batch"]
+    mongo_offset, mongo_batch = checkpoint["mongo"]["offset"], checkpoint["mongo"]["batch"]
+
+    cursor = connection_mysql.cursor()
+
+    # ASINs del archivo cargados en una ejecución anterior
+    cursor.execute("SELECT Asin FROM Items WHERE Type = %s;", (type_id,))
+    seen_asins = {asin for (asin,) in cursor.fetchall()}
+    # Bloque de IDs reservado para los artículos nuevos; se reserva otro cuando se agota
+    next_item_id, end_item_id = 0, 0
+
+    seen_ids = set()    # Los revisores ya existentes se descartan con INSERT IGNORE
+    reviewers, items, mysql_lines = [], [], 0
+    mongo_batches, mongo_lines = [[] for _ in collections], 0
+
+    decode = get_decoder(tuple(dict.fromkeys([*columns, "reviewerID", "reviewerName", "asin"])))
+
+    # Un único hilo escritor para que los lotes se confirmen en MongoDB en orden
+    # Los documentos repetidos no se insertan, por lo que tampoco se vuelven a sumar en los recuentos
+    with PipelinedWriter(1, mongo_queue_size, ignore_duplicates=True, after_write=after_batch) as writer:
+        offset = min(mysql_offset, mongo_offset)
+        for offset, line in read_lines_with_offsets(file_path, offset):
+            line_json = decode(line)
+            next_offset = offset + len(line)
+
+            # Datos para MySQL, si la línea no estaba ya confirmada
+            if offset >= mysql_offset:
+                id = line_json.get("reviewerID", "")
+                name = line_json.get("reviewerName", "")
+                asin = line_json.get("asin", "")
+
+                if id not in seen_ids and name != "":
+                    reviewers.append((id, name))
+                    seen_ids.add(id)
+
+                if asin not in seen_asins:
+                    if next_item_id == end_item_id:
+                        next_item_id = reserve_ids(pool, ITEMS_SEQUENCE, batch_size)
+                        end_item_id = next_item_id + batch_size
+                    items.append((next_item_id, asin, type_id))
+                    seen_asins.add(asin)
+                    next_item_id += 1
+
+                mysql_lines += 1
+                if mysql_lines >= batch_size:
+                    mysql_batch += 1
+                    insert_sql_batch(cursor, reviewers, items)
+                    connection_mysql.commit()
+                    journal.commit(file_name, "mysql", next_offset, mysql_batch)
+                    reviewers, items, mysql_lines = [], [], 0
+
+            # Datos para MongoDB, si la línea no estaba ya confirmada
+            if offset >= mongo_offset:
+                info_json = {column: line_json.get(column, "") for column in columns}
+                info_json["reviewTime"] = parse_review_time(
+                    info_json["reviewTime"], info_json["unixReviewTime"]
+                )
+                info_json["_id"] = f"{category}:{offset}"
+                for batch, (_, extra_fields) in zip(mongo_batches, collections):
+                    batch.append(dict(info_json, **extra_fields))
+
+                mongo_lines += 1
+                if mongo_lines >= batch_size:
+                    mongo_batch += 1
+                    put_mongo_batches(writer, collections, mongo_batches,
+                                      partial(journal.commit, file_name, "mongo", next_offset, mongo_batch))
+                    mongo_batches, mongo_lines = [[] for _ in collections], 0
+
+            offset = next_offset
+
+        # Confirmar los lotes restantes hasta el final del archivo
+        if mysql_lines:
+            insert_sql_batch(cursor, reviewers, items)
+            connection_mysql.commit()
+            journal.commit(file_name, "mysql", offset, mysql_batch + 1)
+        if mongo_lines:
+            put_mongo_batches(writer, collections, mongo_batches,
+                              partial(journal.commit, file_name, "mongo", offset, mongo_batch + 1))
+
+    cursor.close()
+    journal.mark_done(file_name)
+    writer.report(file_name)
+
+def ingest_folder_checkpointed(
+    folder_path, pool, database, columns, journal, collection_PBi=None, batch_size=1000
+):
+    """
+    Carga todos los archivos de una carpeta en MySQL y MongoDB de forma reanudable, archivo a archivo.
+
+    Args:
+        folder_path (str): Ruta de la carpeta que contiene los ficheros.
+        pool (ConnectionPool): Pool de conexiones de la base de datos MySQL.
+        database (pymongo.database.Database): Base de datos de MongoDB con una colección por categoría.
+        columns (list): Lista de nombres de columnas a extraer de los archivos JSON.
+        journal (CheckpointJournal): Diario de puntos de control.
+        collection_PBi (pymongo.collection.Collection, optional): Colección de PowerBI.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+
+    Returns:
+        None
+    """
+    files_list = list_data_files(folder_path)
+    types_list = [(count, category_from_filename(file)) for count, file in enumerate(files_list)]
+
+    # Los tipos se insertan siempre completos: sus IDs dependen solo del orden de los archivos
+    with pool.transaction() as cursor:
+        cursor.executemany("INSERT IGNORE INTO Products (ID, Type) VALUES (%s, %s);", types_list)
+
+    with pool.connection() as connection_mysql:
+        for file, (type_id, file_type) in zip(files_list, types_list):
+            collections = [(database[file_type], {})]
+            if collection_PBi is not None:
+                collections.append((collection_PBi, {"type": file_type}))
+
+            ingest_file_checkpointed(
+                os.path.join(folder_path, file), type_id, collections, columns,
+                pool, connection_mysql, journal, batch_size
+            )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Carga los datos en MySQL y MongoDB.")
+    parser.add_argument(
+        "--checkpoint", action="store_true",
+        help="Carga archivo a archivo guardando puntos de control para poder reanudarla con --resume.",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Reanuda una carga con puntos de control que se interrumpió.",
+    )
+    args = parser.parse_args()
+
+    collections_columns = [
+    ("Reviewers", [("ID", "VARCHAR(100)"), ("Name", "VARCHAR(100)")], ["PRIMARY KEY (ID)"]),
+    ("Products", [("ID", "INT"), ("Type", "VARCHAR(100)")], ["PRIMARY KEY (ID)"]),
+    ("Items", [("ID", "INT"), ("Asin", "VARCHAR(100)"), ("Type", "INT")], ["PRIMARY KEY (ID)", "FOREIGN KEY (Type) REFERENCES PRODUCTS(ID)"]),
+]
+
+    # Colección de PowerBI, que se rellena en la misma lectura de los archivos
+    target_PBi = (database_name_MongoDB_PBi, collection_name_PBi) if load_PBi else None
+
+    # Columnas que se van a extraer de los archivos JSON
+    columns = [
+        "reviewerID",
+        "asin",
+        "helpful",
+        "overall",
+        "summary",
+        "reviewText",
+        "reviewTime",
+        "unixReviewTime",
+    ]
+
+    if args.checkpoint or args.resume:
+        # Carga reanudable: cada lote se confirma en MySQL y MongoDB y se anota en el diario
+        journal = CheckpointJournal(checkpoint_path)
+        if not args.resume:
+            journal.reset()
+
+        create_database(host, user, password, database_name_SQL, collections_columns, if_not_exists=args.resume)
+
+        client = MongoClient(CONNECTION_STRING)
+        collection_PBi = client[target_PBi[0]][target_PBi[1]] if target_PBi else None
+
+        pool = get_pool(host, user, password, database_name_SQL)
+        with client:
+            ingest_folder_checkpointed(
+                folder_path, pool, client[database_name_MongoDB], columns, journal, collection_PBi
+            )
+    else:
+        # En la carga masiva las claves secundarias se añaden al terminar
+        create_database(host, user, password, database_name_SQL, collections_columns, defer_secondary_keys=mysql_bulk_load)
+
+        # Lee cada archivo una sola vez: inserta en MongoDB y obtiene los datos de MySQL
+        data = ingest_folder(
+            folder_path, CONNECTION_STRING, database_name_MongoDB, columns, target_PBi, num_workers=num_workers
+        )
+        if mysql_bulk_load:
+            insert_data_bulk(host, user, password, database_name_SQL, collections_columns, data)
+        else:
+            insert_data(host, user, password, database_name_SQL, collections_columns, data)
+
+    # Índices que necesitan las consultas, creados una vez terminada la carga
+    build_mysql_indexes(host, user, password, database_name_SQL)
+
+    client = MongoClient(CONNECTION_STRING)
+    with client:
+        collection_names = [category_from_filename(file) for file in list_data_files(folder_path)]
+        build_mongo_indexes(client[database_name_MongoDB], collection_names)
+
+    close_pools()
\ No newline at end of file
@@ -1,105 +1,125 @@
-"""
-load_data_PBi.py
-
-Bases de Datos - IMAT
-ICAI, Universidad Pontificia Comillas
-
-Integrantes del grupo:
-    - Carlos Martínez
-    - Lydia Ruiz
-
-Descripción:
-Programa que carga toda la infraestructura de los datos de MongoDB para su visualización en PowerBI.
-"""
-
-from configuracion import (
-    database_name_MongoDB_PBi,
-    CONNECTION_STRING,
-    folder_path,
-)
-
-import os
-import json
-
-from datetime import datetime
-from pymongo import MongoClient
-
-
-def insert_collection_data(
-    file_path, database_name_MongoDB, collection_name, columns, batch_size=1000
-):
-    """
-    Inserta los datos de un archivo JSON en una colección MongoDB, incluyendo una nueva columna 'type'.
-
-    Args:
-        file_path (str): Ruta del archivo JSON.
-        database_name_MongoDB (pymongo.database.Database): Base de datos de MongoDB.
-        collection_name (str): Nombre de la colección en la que insertar los datos.
-        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
-        batch_size (int): Tamaño del lote para las inserciones por lotes.
-
-    Returns:
-        None
-    """
-    # Obtiene el nombre del tipo de documento quitando '_5.json'
-    file_type = os.path.basename(file_path).replace('_5.json', '')
-
-    # Obtiene la colección en la base de datos
-    collection = database_name_MongoDB[collection_name]
-    batch = []
-    batch_counter = 0
-
-    # Abre el archivo JSON y procesa cada línea
-    with open(file_path, "r") as fp:
-        for line in fp:
-            # Carga la línea JSON y extrae las columnas especificadas
-            line_json = json.loads(line)
-            info_json = {column: line_json.get(column, "") for column in columns}
-            info_json["reviewTime"] = datetime.strptime(
-                info_json["reviewTime"], "%m %d, %Y"
-            )
-            # Añadir la columna 'type' con el nombre del archivo de origen modificado
-            info_json['type'] = file_type
-            batch.append(info_json)
-            batch_counter += 1
-
-            # Insertar lote en la base de datos cuando se alcanza el tamaño del lote
-            if batch_counter >= batch_size:
-                collection.insert_many(batch)
-                batch = []  # Reiniciar lote
-                batch_counter = 0  # Reiniciar contador
-
-        # Insertar documentos restantes en el último lote
-        if batch:
-            collection.insert_many(batch)
-
-if __name__ == "__main__":
-
-    # Configuración de la conexión a la base de datos MongoDB
-    client = MongoClient(CONNECTION_STRING)
-
-    database = client[database_name_MongoDB_PBi]
-
-    files_list = os.listdir(folder_path)
-
-    # Nombre fijo de la colección donde se insertarán todos los datos
-    collection_name = 'reviews_collection'  # Puedes cambiar este nombre según tus necesidades
-
-    # Columnas que se van a extraer de los archivos JSON
-    columns = [
-        "reviewerID",
-        "asin",
-        "helpful",
-        "overall",
-        "summary",
-        "reviewText",
-        "reviewTime",
-        "unixReviewTime",
-    ]
-
-    # Itera sobre cada archivo JSON en la carpeta
-    for file in files_list:
-        file_path = os.path.join(folder_path, file)
-
-        # Inserta los datos del archivo en la colección fija
-        insert_collection_data(file_path, database, collection_name, columns)
\ No newline at end of file
+"""
+load_data_PBi.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa que carga toda la infraestructura de los datos de MongoDB para su visualización en PowerBI.
+Solo es necesario si load_data.py se ha ejecutado con 'load_PBi' a False, ya que en otro caso
+la colección de PowerBI se rellena en la misma lectura de los archivos.
+"""
+
+from configuracion import (
+    database_name_MongoDB_PBi,
+    collection_name_PBi,
+    num_workers,
+    CONNECTION_STRING,
+    folder_path,
+)
+
+import os
+
+from pymongo import MongoClient
+from ingesta import insert_file_in_chunks, parse_review_time, get_decoder, open_review_file, category_from_filename, open_writer
+
+
+def insert_collection_data(
+    file_path, database_name_MongoDB, collection_name, columns, batch_size=1000,
+    num_workers=1, connection_string=CONNECTION_STRING
+):
+    """
+    Inserta los datos de un archivo JSON en una colección MongoDB, incluyendo una nueva columna 'type'.
+
+    Con 'num_workers' mayor que 1 el archivo se divide en rangos de bytes alineados con los
+    saltos de línea y cada rango se procesa e inserta en un proceso distinto.
+
+    Args:
+        file_path (str): Ruta del archivo JSON.
+        database_name_MongoDB (pymongo.database.Database): Base de datos de MongoDB.
+        collection_name (str): Nombre de la colección en la que insertar los datos.
+        columns (list): Lista de nombres de columnas a extraer del archivo JSON.
+        batch_size (int): Tamaño del lote para las inserciones por lotes.
+        num_workers (int): Número de procesos que insertan rangos del archivo a la vez.
+        connection_string (str): Cadena de conexión a MongoDB que usan los procesos.
+
+    Returns:
+        None
+    """
+    # Obtiene el nombre del tipo de documento quitando '_5.json' y la extensión de compresión
+    file_type = category_from_filename(file_path)
+
+    if num_workers > 1:
+        insert_file_in_chunks(
+            file_path, connection_string, database_name_MongoDB.name, collection_name,
+            columns, batch_size, num_workers, {"type": file_type}
+        )
+        return
+
+    # Obtiene la colección en la base de datos
+    collection = database_name_MongoDB[collection_name]
+    batch = []
+    batch_counter = 0
+
+    decode = get_decoder(tuple(columns))
+
+    # Abre el archivo JSON y procesa cada línea mientras el escritor inserta los lotes anteriores
+    with open_review_file(file_path) as fp, open_writer() as writer:
+        for line in fp:
+            # Carga la línea JSON y extrae las columnas especificadas
+            line_json = decode(line)
+            info_json = {column: line_json.get(column, "") for column in columns}
+            info_json["reviewTime"] = parse_review_time(
+                info_json["reviewTime"], info_json["unixReviewTime"]
+            )
+            # Añadir la columna 'type' con el nombre del archivo de origen modificado
+            info_json['type'] = file_type
+            batch.append(info_json)
+            batch_counter += 1
+
+            # Enviar el lote al escritor cuando se alcanza el tamaño del lote
+            if batch_counter >= batch_size:
+                writer.put(collection, batch, extra_keys=["type"])
+                batch = []  # Reiniciar lote
+                batch_counter = 0  # Reiniciar contador
+
+        # Enviar documentos restantes en el último lote
+        if batch:
+            writer.put(collection, batch, extra_keys=["type"])
+
+    writer.report(file_type)
+
+if __name__ == "__main__":
+
+    # Configuración de la conexión a la base de datos MongoDB
+    client = MongoClient(CONNECTION_STRING)
+
+    database = client[database_name_MongoDB_PBi]
+
+    files_list = os.listdir(folder_path)
+
+    # Nombre fijo de la colección donde se insertarán todos los datos
+    collection_name = collection_name_PBi
+
+    # Columnas que se van a extraer de los archivos JSON
+    columns = [
+        "reviewerID",
+        "asin",
+        "helpful",
+        "overall",
+        "summary",
+        "reviewText",
+        "reviewTime",
+        "unixReviewTime",
+    ]
+
+    # Itera sobre cada archivo JSON en la carpeta
+    for file in files_list:
+        file_path = os.path.join(folder_path, file)
+
+        # Inserta los datos del archivo en la colección fija
+        insert_collection_data(file_path, database, collection_name, columns, num_workers=num_workers)
\ No newline at end of file
@@ -1,392 +1,837 @@
-"""
-queries.py
-
-Bases de Datos - IMAT
-ICAI, Universidad Pontificia Comillas
-
-Integrantes del grupo:
-    - Carlos Martínez
-    - Lydia Ruiz
-
-Descripción:
-Programa para obtener diferentes plots de visualización de diferentes datos usados en el menú.
-"""
-
-import matplotlib.pyplot as plt
-from collections import defaultdict
-from wordcloud import WordCloud
-
-
-def first_query(database, collection_names):
-    """
-    Realiza una consulta a la base de datos MongoDB para obtener el recuento de revisiones
-    por año para cada producto en las colecciones especificadas.
-
-    Parameters:
-        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
-        - collection_names (list): Lista de nombres de colecciones en la base de datos.
-
-    Returns:
-        - reviews_counts_by_year: Un diccionario defaultdict donde las claves son los
-          años y los valores son los recuentos de revisiones de ese año.
-    """
-    reviews_counts_by_year = defaultdict(int)
-
-    for collection_name in collection_names:
-        collection = database[collection_name]
-
-        # Realizar una consulta de agregación para calcular el recuento de revisiones por año
-        query = collection.aggregate(
-            [
-                {"$group": {"_id": {"$year": "$reviewTime"}, "count": {"$sum": 1}}},
-                {"$sort": {"_id": 1}},
-            ]
-        )
-
-        # Procesar los resultados de la consulta
-        for result in query:
-            year = result["_id"]
-            count = result["count"]
-            reviews_counts_by_year[year] = count
-
-    return reviews_counts_by_year
-
-
-def plot_reviews_year(reviews_counts_by_year, product_type="todos los productos"):
-    """
-    Grafica la evolución del número de revisiones por año para los productos especificados.
-
-    Parameters:
-        - reviews_counts_by_year: Un diccionario que contiene los recuentos de revisiones
-          por año para cada producto.
-        - product_type: El tipo de producto para el que se están graficando las revisiones.
-          Por defecto, se establece en "todos los productos".
-    """
-    # Desempaquetar las claves (años) y los valores (recuentos de revisiones) del diccionario
-    years, review_counts = zip(*reviews_counts_by_year.items())
-
-    # Crear el gráfico de barras
-    plt.figure(figsize=(10, 6))
-    plt.bar(years, review_counts)
-
-    # Añadir título y etiquetas de ejes al gráfico
-    plt.title(f"Reviews por año de {product_type}")
-    plt.xlabel("Años")
-    plt.ylabel("Número de reviews")
-
-    # Establecer los años como etiquetas en el eje x
-    plt.xticks(range(min(years), max(years) + 1))
-
-    # Mostrar gráfico
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
-    plt.show()
-
-
-def second_query(database, collection_names):
-    """
-    Realiza una consulta a la base de datos MongoDB para obtener el recuento de revisiones
-    por mes para cada producto en las colecciones especificadas.
-
-    Parameters:
-        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
-        - collection_names (list): Lista de nombres de colecciones en la base de datos.
-
-    Returns:
-        - reviews_counts_by_month: Un diccionario defaultdict donde las claves son los
-          códigos ASIN de los productos y los valores son los recuentos de revisiones.
-    """
-    reviews_counts_by_month = defaultdict(int)
-
-    for collection_name in collection_names:
-        collection = database[collection_name]
-
-        # Realizar una consulta de agregación para calcular el recuento de revisiones
-        query = collection.aggregate(
-            [
-                {"$group": {"_id": "$asin", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-            ]
-        )
-
-        # Procesar los resultados de la consulta
-        for result in query:
-            asin = result["_id"]
-            count = result["count"]
-            reviews_counts_by_month[asin] = count
-
-    return reviews_counts_by_month
-
-
-def plot_reviews_asin(reviews_counts_by_month, product_type="todos los productos"):
-    """
-    Grafica la evolución de la popularidad de los productos a lo largo del tiempo,
-    utilizando el recuento de revisiones por mes.
-
-    Parameters:
-        - reviews_counts_by_month: Un diccionario que contiene los recuentos de revisiones
-          por mes para cada producto.
-        - product_type: El tipo de producto para el que se están graficando las revisiones.
-          Por defecto, se establece en "todos los productos".
-    """
-    asin_list, count_list = zip(*reviews_counts_by_month.items())
-
-    # Graficar los recuentos de revisiones
-    plt.figure(figsize=(8, 6))
-    plt.plot(list(range(len(asin_list))), count_list)
-
-    # Configuración de la apariencia de la gráfica
-    plt.title(f"Evolución de la popularidad de {product_type}")
-    plt.xlabel("Artículos")
-    plt.ylabel("Número de reviews")
-    plt.xticks([])
-    plt.show()
-
-
-def third_query(database, collection_options, user_option="Everything"):
-    score_counts = {}
-
-    collections_to_query = (
-        [user_option] if user_option in collection_options else collection_options
-    )
-
-    for option in collections_to_query:
-        collection = database[option]
-        query = collection.aggregate(
-            [
-                {"$group": {"_id": "$overall", "count": {"$sum": 1}}},
-                {"$sort": {"_id": 1}},
-            ]
-        )
-        for doc in query:
-            if doc["_id"] in score_counts:
-                score_counts[doc["_id"]] += doc["count"]
-            else:
-                score_counts[doc["_id"]] = doc["count"]
-
-    scores = list(score_counts.keys())
-    counts = [score_counts[score] for score in scores]
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(scores, counts, width=0.4)
-    plt.title(
-        f"Reviews por nota {'de todos los productos' if user_option == 'Everything' else 'de ' + user_option}"
-    )
-    plt.xlabel("Nota")
-    plt.ylabel("Número de reviews")
-    plt.xticks(scores)
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
-    plt.show()
-
-
-def fourth_query(database, collection_names):
-    """
-    Realiza una consulta a la base de datos y devuelve una lista de timestamps de reviews.
-
-    Parameters:
-        database (pymongo.database.Database): La base de datos MongoDB.
-        collection_names (list): Lista de nombres de colecciones a consultar.
-
-    Returns:
-        list: Lista de timestamps de reviews.
-    """
-
-    time_stamps = []
-    for collection in collection_names:
-        collection = database[collection]
-
-        # Consultar la colección y extraer los timestamps de las reviews
-        query = collection.find({}, {"_id": 0, "unixReviewTime": 1})
-        time_stamps.extend([result["unixReviewTime"] for result in query])
-
-    # Ordenar los timestamps en orden ascendente
-    time_stamps.sort()
-
-    return time_stamps
-
-
-def plot_reviews_evolution(time_stamp, product_type="todos los productos"):
-    """
-    Grafica la evolución de las reviews a lo largo del tiempo.
-
-    Parameters:
-        timestamps (list): Lista de timestamps de reviews.
-        product_type (str): Tipo de producto. Por defecto, "Todos los productos".
-    """
-
-    # Crear el gráfico
-    plt.figure(figsize=(8, 6))
-    plt.plot(time_stamp, range(len(time_stamp)))
-
-    # Añadir título y etiquetas de ejes al gráfico
-    plt.title(f"Evolución de las reviews a lo largo del tiempo de {product_type}")
-    plt.xlabel("Tiempo")
-    plt.ylabel("Número de reviews hasta ese momento")
-
-    # Añadir una cuadrícula al gráfico para mayor claridad
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
-
-    # Mostrar el gráfico
-    plt.show()
-
-
-def fifth_query(database, collection_names):
-    """
-    Cuenta el número de revisiones por usuario en las colecciones especificadas.
-
-    Parameters:
-        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
-        - collection_names (list): Lista de nombres de colecciones en la base de datos.
-
-    Returns:
-        - reviews_by_user: Un diccionario donde las claves son los IDs de los revisores
-          y los valores son el número de revisiones que ha realizado cada usuario.
-    """
-    reviews_by_user = defaultdict(int)
-
-    for collection_name in collection_names:
-        collection = database[collection_name]
-
-        # Realizar una consulta de agregación para calcular el recuento de revisiones por usuario
-        query = collection.aggregate(
-            [{"$group": {"_id": "$reviewerID", "count": {"$sum": 1}}}]
-        )
-
-        # Procesar los resultados de la consulta
-        for result in query:
-            user = result["_id"]
-            count = result["count"]
-            reviews_by_user[user] += count
-
-    return reviews_by_user
-
-
-def plot_reviews_user(reviews_by_user):
-    """
-    Grafica el histograma del número de revisiones por usuario.
-
-    Parameters:
-        - reviews_by_user: Un diccionario que contiene los IDs de los revisores
-          y el número de revisiones que ha realizado cada usuario.
-    """
-    counts_histogram = defaultdict(int)
-
-    # Contar las frecuencias de los recuentos de revisiones por usuario
-    for count in reviews_by_user.values():
-        counts_histogram[count] += 1
-
-    # Ordenar el histograma por los recuentos de revisiones
-    counts_histogram = dict(sorted(counts_histogram.items()))
-
-    # Graficar el histograma
-    plt.figure(figsize=(8, 6))
-    plt.bar(counts_histogram.keys(), counts_histogram.values())
-    plt.xticks([])
-    plt.xlabel("Número de reviews")
-    plt.ylabel("Número de usuarios")
-    plt.title("Histograma del número de reviews por usuario")
-    plt.show()
-
-
-def sixth_query(database, collection_options):
-    """
-    Consulta la base de datos para extraer el texto de las reviews de una colección específica.
-
-    Parameters:
-        database (pymongo.database.Database): La base de datos MongoDB.
-        collection_options (str): El nombre de la colección a consultar.
-
-    Returns:
-        list: Lista de textos de las reviews.
-    """
-    collection = database[collection_options]
-    query = collection.find({}, {"_id": 0, "reviewText": 1})
-    review_texts = [result["reviewText"] for result in query if "reviewText" in result]
-
-    return review_texts
-
-
-def create_wordcloud(texts):
-    """
-    Crea y muestra una nube de palabras a partir de una lista de textos de reviews.
-
-    Parameters:
-        texts (list): Lista de textos de las reviews.
-    """
-    combined_text = " ".join(texts)
-
-    wordcloud = WordCloud(
-        width=800,
-        height=400,
-        min_word_length=4,
-        background_color="white",
-        colormap="magma",
-    ).generate(combined_text)
-
-    # Visualizamos la nube de palabras
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation="bilinear")
-    plt.axis("off")
-    plt.show()
-
-
-def seventh_query(database, collection_names):
-    """
-    Realiza una consulta a la base de datos y devuelve el recuento de revisiones por mes.
-
-    Parameters:
-        database (pymongo.database.Database): La base de datos MongoDB.
-        collection_names (list): Lista de nombres de colecciones a consultar.
-
-    Returns:
-        dict: Diccionario con el recuento de revisiones por mes.
-    """
-
-    # Diccionario para almacenar el recuento de revisiones por mes
-    review_counts_by_month = defaultdict(int)
-
-    # Iterar sobre las colecciones proporcionadas
-    for collection_name in collection_names:
-        collection = database[collection_name]
-
-        # Consulta de agregación para contar las revisiones por mes
-        query = collection.aggregate(
-            [
-                {"$group": {"_id": {"$month": "$reviewTime"}, "count": {"$sum": 1}}},
-                {"$sort": {"_id": 1}},
-            ]
-        )
-
-        # Procesar los resultados de la consulta
-        for result in query:
-            month = result["_id"]
-            count = result["count"]
-            review_counts_by_month[month] += count
-
-    return review_counts_by_month
-
-
-def plot_reviews_month(reviews_counts_by_month, product_type="todos los productos"):
-    """
-    Grafica el número de revisiones por mes.
-
-    Parameters:
-        reviews_counts_by_month (dict): Diccionario con el recuento de revisiones por mes.
-        product_type (str): Tipo de producto. Por defecto, "todos los productos".
-    """
-
-    # Desempaquetar las claves (meses) y los valores (recuentos de revisiones) del diccionario
-    months, review_counts = zip(*reviews_counts_by_month.items())
-
-    # Crear el gráfico de barras
-    plt.bar(months, review_counts)
-
-    # Añadir título y etiquetas de ejes al gráfico
-    plt.title(f"Número de revisiones por mes - {product_type}")
-    plt.xlabel("Mes")
-    plt.ylabel("Número de revisiones")
-
-    # Establecer los meses como etiquetas en el eje x
-    plt.xticks(months)
-
-    # Mostrar el gráfico
-    plt.show()
+"""
+queries.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa para obtener diferentes plots de visualización de diferentes datos usados en el menú.
+"""
+
+import math
+import time
+import matplotlib.pyplot as plt
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from wordcloud import WordCloud
+from rollups import rollups_available, read_rollup, count_terms, merge_terms, TERM_DIMENSION
+from cache_consultas import cached_query
+from configuracion import (
+    evolution_resolution,
+    evolution_max_points,
+    popularity_top_k,
+    popularity_tail_points,
+    query_threads,
+)
+
+# Segundos que tardó cada colección en la última consulta ejecutada con varios hilos
+last_collection_timings = {}
+
+
+def show_or_save(output_path=None):
+    """
+    Muestra el gráfico actual o, si se indica una ruta, lo guarda en ese fichero y lo cierra.
+
+    Parameters:
+        - output_path (str): Ruta del fichero. El formato se deduce de su extensión.
+    """
+    if output_path is None:
+        plt.show()
+    else:
+        plt.savefig(output_path, bbox_inches="tight")
+        plt.close()
+
+
+def aggregate_each_collection(database, collection_names, pipeline, allow_disk_use=True, num_threads=query_threads):
+    """
+    Ejecuta un pipeline de agregación en cada colección por separado, con varias colecciones a
+    la vez en un grupo de hilos. Todos los hilos usan el mismo MongoClient, que es seguro entre
+    hilos y reparte las consultas entre sus conexiones.
+
+    Cada hilo solo lee los resultados de su colección; se combinan después en el hilo que llama,
+    en el orden de 'collection_names', por lo que no hace falta proteger el resultado con un
+    cerrojo. El tiempo de cada colección se guarda en 'last_collection_timings'.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_names (list): Lista de nombres de colecciones en la base de datos.
+        - pipeline (list): Etapas del pipeline de agregación.
+        - allow_disk_use (bool): Si es True, el servidor puede usar disco temporal.
+        - num_threads (int): Número máximo de colecciones que se consultan a la vez.
+
+    Returns:
+        - Lista con los documentos resultado del pipeline en todas las colecciones.
+    """
+    def run(collection_name):
+        start = time.perf_counter()
+        results = list(database[collection_name].aggregate(pipeline, allowDiskUse=allow_disk_use))
+        return results, time.perf_counter() - start
+
+    global last_collection_timings
+    with ThreadPoolExecutor(max_workers=min(num_threads, len(collection_names))) as executor:
+        futures = [executor.submit(run, collection_name) for collection_name in collection_names]
+        partial_results = [future.result() for future in futures]
+
+    last_collection_timings = {
+        collection_name: seconds
+        for collection_name, (_, seconds) in zip(collection_names, partial_results)
+    }
+    return [result for results, _ in partial_results for result in results]
+
+def report_collection_timings():
+    """
+    Muestra el tiempo de cada colección en la última consulta ejecutada con varios hilos.
+
+    Returns:
+        None
+    """
+    for collection_name, seconds in last_collection_timings.items():
+        print(f"    {collection_name}: {seconds * 1000:.1f} ms")
+
+
+def aggregate_collections(database, collection_names, pipeline, use_union=True, allow_disk_use=True,
+                          num_threads=query_threads):
+    """
+    Ejecuta un pipeline de agregación sobre varias colecciones.
+
+    Con 'use_union' las colecciones se unen en el servidor con '$unionWith' y el pipeline se
+    ejecuta una sola vez sobre todas ellas, por lo que los resultados llegan ya combinados en una
+    única consulta. Si no, se ejecuta el pipeline en cada colección por separado y se devuelven
+    los resultados de todas, que hay que combinar en el cliente. Con más de un hilo las
+    colecciones se consultan a la vez, y el tiempo total es el de la más lenta en lugar de la
+    suma de todas; a cambio, los resultados de cada colección se leen enteros en una lista en
+    lugar de leerse del cursor por lotes, por lo que ocupan memoria en el cliente.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_names (list): Lista de nombres de colecciones en la base de datos.
+        - pipeline (list): Etapas del pipeline de agregación.
+        - use_union (bool): Si es True, se usa '$unionWith' (requiere MongoDB 4.4 o superior).
+        - allow_disk_use (bool): Si es True, las etapas que superan el límite de memoria del
+          servidor escriben en disco temporal en lugar de fallar.
+        - num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        - Iterable con los documentos resultado del pipeline. Salvo con varios hilos, se leen
+          del cursor por lotes.
+    """
+    if not collection_names:
+        return []
+
+    if use_union:
+        first_collection, *other_collections = collection_names
+        union = [{"$unionWith": {"coll": name}} for name in other_collections]
+        return database[first_collection].aggregate(union + pipeline, allowDiskUse=allow_disk_use)
+
+    if num_threads > 1 and len(collection_names) > 1:
+        return aggregate_each_collection(database, collection_names, pipeline, allow_disk_use, num_threads)
+
+    return (
+        result
+        for collection_name in collection_names
+        for result in database[collection_name].aggregate(pipeline, allowDiskUse=allow_disk_use)
+    )
+
+
+def count_reviews(database, collection_names, dimension, pipeline, use_union=True, use_rollups=True,
+                  stages=(), allow_disk_use=True, num_threads=query_threads):
+    """
+    Obtiene el recuento de reviews agrupado por una dimensión. Si los recuentos precalculados de
+    todas las colecciones están al día se leen de ellos; si no, se ejecuta el pipeline sobre las
+    colecciones de reviews.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_names (list): Lista de nombres de colecciones en la base de datos.
+        - dimension (str): Dimensión de los recuentos precalculados equivalente al pipeline.
+        - pipeline (list): Pipeline de agregación que agrupa por la dimensión.
+        - use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        - use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+        - stages (list): Etapas que se aplican en el servidor a los recuentos ya combinados de
+          todas las colecciones. Requieren 'use_union' o los recuentos precalculados.
+        - allow_disk_use (bool): Si es True, el servidor puede usar disco temporal.
+        - num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        - Iterable con documentos {"_id": clave, "count": recuento}, o el resultado de 'stages'.
+    """
+    if use_rollups and collection_names and rollups_available(database, collection_names):
+        # Mismo orden que el pipeline
+        sort = next((stage["$sort"] for stage in pipeline if "$sort" in stage), None)
+        return read_rollup(database, dimension, collection_names, sort, list(stages), allow_disk_use)
+
+    return aggregate_collections(
+        database, collection_names, pipeline + list(stages), use_union, allow_disk_use, num_threads
+    )
+
+def combined_on_server(database, collection_names, use_union=True, use_rollups=True):
+    """
+    Indica si 'count_reviews' combina en el servidor los recuentos de todas las colecciones, con
+    '$unionWith' o leyendo los recuentos precalculados, y por tanto admite etapas 'stages'.
+    """
+    return use_union or (
+        use_rollups and bool(collection_names) and rollups_available(database, collection_names)
+    )
+
+
+@cached_query
+def first_query(database, collection_names, use_union=True, use_rollups=True, num_threads=query_threads):
+    """
+    Realiza una consulta a la base de datos MongoDB para obtener el recuento de revisiones
+    por año para cada producto en las colecciones especificadas.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_names (list): Lista de nombres de colecciones en la base de datos.
+        - use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        - use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+        - num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        - reviews_counts_by_year: Un diccionario defaultdict donde las claves son los
+          años y los valores son los recuentos de revisiones de ese año.
+    """
+    reviews_counts_by_year = defaultdict(int)
+
+    # Realizar una consulta de agregación para calcular el recuento de revisiones por año
+    query = count_reviews(
+        database,
+        collection_names,
+        "year",
+        [
+            {"$group": {"_id": {"$year": "$reviewTime"}, "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ],
+        use_union,
+        use_rollups,
+        num_threads=num_threads,
+    )
+
+    # Procesar los resultados de la consulta
+    for result in query:
+        year = result["_id"]
+        count = result["count"]
+        reviews_counts_by_year[year] += count
+
+    return reviews_counts_by_year
+
+
+def plot_reviews_year(reviews_counts_by_year, product_type="todos los productos", output_path=None):
+    """
+    Grafica la evolución del número de revisiones por año para los productos especificados.
+
+    Parameters:
+        - reviews_counts_by_year: Un diccionario que contiene los recuentos de revisiones
+          por año para cada producto.
+        - product_type: El tipo de producto para el que se están graficando las revisiones.
+          Por defecto, se establece en "todos los productos".
+        - output_path: Ruta del fichero (.png, .svg...) donde se guarda el gráfico. Si es
+          None, se muestra en pantalla.
+    """
+    # Desempaquetar las claves (años) y los valores (recuentos de revisiones) del diccionario
+    years, review_counts = zip(*reviews_counts_by_year.items())
+
+    # Crear el gráfico de barras
+    plt.figure(figsize=(10, 6))
+    plt.bar(years, review_counts)
+
+    # Añadir título y etiquetas de ejes al gráfico
+    plt.title(f"Reviews por año de {product_type}")
+    plt.xlabel("Años")
+    plt.ylabel("Número de reviews")
+
+    # Establecer los años como etiquetas en el eje x
+    plt.xticks(range(min(years), max(years) + 1))
+
+    # Mostrar gráfico
+    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    show_or_save(output_path)
+
+
+def rank_quantiles(counts_histogram, first_rank, points):
+    """
+    Obtiene puntos de la curva de popularidad (número de reviews de cada artículo, ordenados de
+    más a menos reviews) a partir del número de artículos que tiene cada número de reviews.
+
+    Parameters:
+        - counts_histogram (list): Lista de tuplas (número de reviews, número de artículos),
+          ordenada de mayor a menor número de reviews.
+        - first_rank (int): Primera posición de la curva que se obtiene.
+        - points (int): Número máximo de puntos, repartidos por igual desde 'first_rank' hasta
+          el último artículo, que siempre se incluye.
+
+    Returns:
+        - Lista de tuplas (posición, número de reviews del artículo en esa posición).
+    """
+    total = sum(items for _, items in counts_histogram)
+    if total <= first_rank:
+        return []
+
+    length = total - first_rank
+    if length <= points:
+        ranks = range(first_rank, total)
+    else:
+        intervals = max(points - 1, 1)
+        ranks = sorted({first_rank + round(i * (length - 1) / intervals) for i in range(intervals + 1)})
+
+    # Las posiciones están ordenadas, así que el histograma se recorre una sola vez
+    tail = []
+    segments = iter(counts_histogram)
+    end, count = 0, None
+    for rank in ranks:
+        while rank >= end:
+            count, items = next(segments)
+            end += items
+        tail.append((rank, count))
+    return tail
+
+
+@cached_query
+def second_query(database, collection_names, top_k=popularity_top_k, tail_points=popularity_tail_points,
+                 use_union=True, use_rollups=True, num_threads=query_threads):
+    """
+    Realiza una consulta a la base de datos MongoDB para obtener el recuento de revisiones
+    por mes para cada producto en las colecciones especificadas.
+
+    Con 'top_k' solo se obtienen exactos los 'top_k' artículos con más reviews, y el resto de la
+    curva de popularidad se resume en 'tail_points' puntos. Con 'use_union' o con los recuentos
+    precalculados, el servidor devuelve en un único documento los primeros artículos y cuántos
+    artículos tienen cada número de reviews, de forma que lo que llega no depende del número de
+    artículos.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_names (list): Lista de nombres de colecciones en la base de datos.
+        - top_k (int): Número de artículos con más reviews que se obtienen. Si es None, se
+          obtiene el recuento de todos los artículos.
+        - tail_points (int): Número máximo de puntos del resto de la curva.
+        - use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        - use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+        - num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        - Si 'top_k' es None, reviews_counts_by_month: Un diccionario defaultdict donde las
+          claves son los códigos ASIN de los productos y los valores son los recuentos de revisiones.
+        - Si no, una tupla (top_items, tail): un diccionario con los 'top_k' artículos con más
+          reviews, de más a menos, y una lista de tuplas (posición, número de reviews) con el
+          resto de la curva.
+    """
+    if top_k is not None and combined_on_server(database, collection_names, use_union, use_rollups):
+        query = count_reviews(
+            database,
+            collection_names,
+            "asin",
+            [{"$group": {"_id": "$asin", "count": {"$sum": 1}}}],
+            use_union,
+            use_rollups,
+            stages=[
+                {
+                    "$facet": {
+                        # '$limit' no admite 0
+                        "top": [{"$sort": {"count": -1, "_id": 1}}, {"$limit": max(top_k, 1)}],
+                        "histogram": [
+                            {"$group": {"_id": "$count", "items": {"$sum": 1}}},
+                            {"$sort": {"_id": -1}},
+                        ],
+                    }
+                }
+            ],
+        )
+        result = next(iter(query), {"top": [], "histogram": []})
+        top_items = {item["_id"]: item["count"] for item in result["top"][:top_k]}
+        counts_histogram = [(bar["_id"], bar["items"]) for bar in result["histogram"]]
+        return top_items, rank_quantiles(counts_histogram, len(top_items), tail_points)
+
+    reviews_counts_by_month = defaultdict(int)
+
+    # Realizar una consulta de agregación para calcular el recuento de revisiones
+    query = count_reviews(
+        database,
+        collection_names,
+        "asin",
+        [
+            {"$group": {"_id": "$asin", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+        ],
+        use_union,
+        use_rollups,
+        num_threads=num_threads,
+    )
+
+    # Procesar los resultados de la consulta
+    for result in query:
+        asin = result["_id"]
+        count = result["count"]
+        reviews_counts_by_month[asin] += count
+
+    if top_k is None:
+        return reviews_counts_by_month
+
+    # Si cada colección se consulta por separado, la curva se resume en el cliente
+    ranking = sorted(reviews_counts_by_month.items(), key=lambda kv: (-kv[1], kv[0]))
+    top_items = dict(ranking[:top_k])
+    counts_histogram = defaultdict(int)
+    for count in reviews_counts_by_month.values():
+        counts_histogram[count] += 1
+    counts_histogram = sorted(counts_histogram.items(), reverse=True)
+    return top_items, rank_quantiles(counts_histogram, len(top_items), tail_points)
+
+
+def plot_reviews_asin(reviews_counts_by_month, product_type="todos los productos", tail=None,
+                      output_path=None):
+    """
+    Grafica la evolución de la popularidad de los productos a lo largo del tiempo,
+    utilizando el recuento de revisiones por mes.
+
+    Parameters:
+        - reviews_counts_by_month: Un diccionario que contiene los recuentos de revisiones
+          por mes para cada producto, ordenados de más a menos reviews.
+        - product_type: El tipo de producto para el que se están graficando las revisiones.
+          Por defecto, se establece en "todos los productos".
+        - tail: Lista de tuplas (posición, número de reviews) con el resto de la curva
+          después de los artículos de 'reviews_counts_by_month'.
+        - output_path: Ruta del fichero (.png, .svg...) donde se guarda el gráfico. Si es
+          None, se muestra en pantalla.
+    """
+    ranks = list(range(len(reviews_counts_by_month)))
+    count_list = list(reviews_counts_by_month.values())
+    for rank, count in tail or []:
+        ranks.append(rank)
+        count_list.append(count)
+
+    # Graficar los recuentos de revisiones
+    plt.figure(figsize=(8, 6))
+    plt.plot(ranks, count_list)
+
+    # Configuración de la apariencia de la gráfica
+    plt.title(f"Evolución de la popularidad de {product_type}")
+    plt.xlabel("Artículos")
+    plt.ylabel("Número de reviews")
+    plt.xticks([])
+    show_or_save(output_path)
+
+
+@cached_query
+def third_query(database, collection_options, user_option="Everything", use_union=True, use_rollups=True,
+                num_threads=query_threads):
+    """
+    Realiza una consulta a la base de datos MongoDB para obtener el recuento de revisiones
+    por nota de una categoría o de todas las categorías.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_options (list): Lista de nombres de colecciones en la base de datos.
+        - user_option (str): Categoría elegida por el usuario. Si no es una de las colecciones
+          ("Everything"), se consultan todas.
+        - use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        - use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+        - num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        - score_counts: Un diccionario donde las claves son las notas y los valores son
+          los recuentos de revisiones con esa nota.
+    """
+    score_counts = {}
+
+    collections_to_query = (
+        [user_option] if user_option in collection_options else collection_options
+    )
+
+    query = count_reviews(
+        database,
+        collections_to_query,
+        "overall",
+        [
+            {"$group": {"_id": "$overall", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ],
+        use_union,
+        use_rollups,
+        num_threads=num_threads,
+    )
+    for doc in query:
+        if doc["_id"] in score_counts:
+            score_counts[doc["_id"]] += doc["count"]
+        else:
+            score_counts[doc["_id"]] = doc["count"]
+
+    return score_counts
+
+
+def plot_reviews_score(score_counts, product_type="todos los productos", output_path=None):
+    """
+    Grafica el número de revisiones por nota.
+
+    Parameters:
+        - score_counts: Un diccionario que contiene los recuentos de revisiones por nota.
+        - product_type: El tipo de producto para el que se están graficando las revisiones.
+          Por defecto, se establece en "todos los productos".
+        - output_path: Ruta del fichero (.png, .svg...) donde se guarda el gráfico. Si es
+          None, se muestra en pantalla.
+    """
+    scores = list(score_counts.keys())
+    counts = [score_counts[score] for score in scores]
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(scores, counts, width=0.4)
+    plt.title(f"Reviews por nota de {product_type}")
+    plt.xlabel("Nota")
+    plt.ylabel("Número de reviews")
+    plt.xticks(scores)
+    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    show_or_save(output_path)
+
+
+@cached_query
+def fourth_query(database, collection_names, resolution=evolution_resolution,
+                 max_points=evolution_max_points, use_union=True, num_threads=query_threads):
+    """
+    Realiza una consulta a la base de datos y devuelve la evolución del número de reviews a lo
+    largo del tiempo.
+
+    Por defecto los timestamps se agrupan en el servidor en intervalos de 'resolution' segundos,
+    de forma que solo llega un documento por intervalo en lugar de uno por review. Cada punto de
+    la serie es el último timestamp de un intervalo y el número de reviews hasta ese momento, por
+    lo que la curva coincide con la de todos los timestamps en esos puntos. Si hay más de
+    'max_points' intervalos se conservan solo algunos de ellos, repartidos a lo largo de la serie.
+
+    Parameters:
+        database (pymongo.database.Database): La base de datos MongoDB.
+        collection_names (list): Lista de nombres de colecciones a consultar.
+        resolution (int): Segundos de cada intervalo. Si es None, se devuelven todos los timestamps.
+        max_points (int): Número máximo de puntos de la serie.
+        use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        tuple: Una tupla (timestamps, recuentos acumulados) si se agrupa por intervalos.
+        list: Lista de timestamps de reviews si 'resolution' es None.
+    """
+    if resolution is not None:
+        return binned_evolution(database, collection_names, resolution, max_points, use_union, num_threads)
+
+    time_stamps = []
+    for collection in collection_names:
+        collection = database[collection]
+
+        # Consultar la colección y extraer los timestamps de las reviews
+        query = collection.find({}, {"_id": 0, "unixReviewTime": 1})
+        time_stamps.extend([result["unixReviewTime"] for result in query])
+
+    # Ordenar los timestamps en orden ascendente
+    time_stamps.sort()
+
+    return time_stamps
+
+
+def binned_evolution(database, collection_names, resolution, max_points=None, use_union=True,
+                     num_threads=query_threads):
+    """
+    Obtiene la serie acumulada del número de reviews agrupando los timestamps en intervalos en
+    el servidor.
+
+    Parameters:
+        database (pymongo.database.Database): La base de datos MongoDB.
+        collection_names (list): Lista de nombres de colecciones a consultar.
+        resolution (int): Segundos de cada intervalo.
+        max_points (int, optional): Número máximo de puntos de la serie.
+        use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        tuple: Una tupla (timestamps, recuentos acumulados), ordenada por tiempo.
+    """
+    bins = {}
+
+    # Recuento y último timestamp de cada intervalo
+    query = aggregate_collections(
+        database,
+        collection_names,
+        [
+            {
+                "$group": {
+                    "_id": {"$subtract": ["$unixReviewTime", {"$mod": ["$unixReviewTime", resolution]}]},
+                    "last": {"$max": "$unixReviewTime"},
+                    "count": {"$sum": 1},
+                }
+            },
+        ],
+        use_union,
+        num_threads=num_threads,
+    )
+
+    # Si cada colección se consulta por separado, un mismo intervalo llega varias veces
+    for result in query:
+        last, count = bins.get(result["_id"], (result["last"], 0))
+        bins[result["_id"]] = (max(last, result["last"]), count + result["count"])
+
+    bins = [bins[key] for key in sorted(bins)]
+    time_stamps = [last for last, _ in bins]
+    cumulative_counts = list(accumulate(count for _, count in bins))
+
+    # Se conserva uno de cada 'step' puntos, y siempre el último para que la serie acabe en el total
+    if max_points and len(time_stamps) > max_points:
+        step = math.ceil(len(time_stamps) / max_points)
+        kept = list(range(len(time_stamps) - 1, -1, -step))[::-1]
+        time_stamps = [time_stamps[index] for index in kept]
+        cumulative_counts = [cumulative_counts[index] for index in kept]
+
+    return time_stamps, cumulative_counts
+
+
+def plot_reviews_evolution(time_stamp, product_type="todos los productos", cumulative_counts=None,
+                           output_path=None):
+    """
+    Grafica la evolución de las reviews a lo largo del tiempo.
+
+    Parameters:
+        timestamps (list): Lista de timestamps de reviews, o de los puntos de la serie.
+        product_type (str): Tipo de producto. Por defecto, "Todos los productos".
+        cumulative_counts (list, optional): Número de reviews hasta cada timestamp. Si es None,
+            cada timestamp es una review.
+        output_path (str, optional): Ruta del fichero (.png, .svg...) donde se guarda el gráfico.
+            Si es None, se muestra en pantalla.
+    """
+    if cumulative_counts is None:
+        cumulative_counts = range(len(time_stamp))
+
+    # Crear el gráfico
+    plt.figure(figsize=(8, 6))
+    plt.plot(time_stamp, cumulative_counts)
+
+    # Añadir título y etiquetas de ejes al gráfico
+    plt.title(f"Evolución de las reviews a lo largo del tiempo de {product_type}")
+    plt.xlabel("Tiempo")
+    plt.ylabel("Número de reviews hasta ese momento")
+
+    # Añadir una cuadrícula al gráfico para mayor claridad
+    plt.grid(axis="y", linestyle="--", alpha=0.7)
+
+    # Mostrar el gráfico
+    show_or_save(output_path)
+
+
+@cached_query
+def fifth_query(database, collection_names, histogram=True, use_union=True, use_rollups=True,
+                allow_disk_use=True, num_threads=query_threads):
+    """
+    Cuenta el número de revisiones por usuario en las colecciones especificadas.
+
+    Con 'histogram' se obtiene directamente el histograma: cuántos usuarios han escrito cada
+    número de reviews. Con 'use_union' o con los recuentos precalculados se calcula entero en el
+    servidor, sumando antes las reviews de cada usuario en todas las categorías, y solo llegan
+    las barras del histograma. Si cada colección se consulta por separado, las reviews de cada
+    usuario se suman en el cliente.
+
+    Parameters:
+        - database (pymongo.database.Database): Objeto de base de datos MongoDB.
+        - collection_names (list): Lista de nombres de colecciones en la base de datos.
+        - histogram (bool): Si es True, se devuelve el histograma en lugar del recuento por usuario.
+        - use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        - use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+        - allow_disk_use (bool): Si es True, el servidor puede usar disco temporal al agrupar
+          por usuario en lugar de fallar al superar su límite de memoria.
+        - num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        - counts_histogram: Si 'histogram' es True, un diccionario ordenado donde las claves son
+          números de reviews y los valores el número de usuarios que han escrito ese número.
+        - reviews_by_user: Si no, un diccionario donde las claves son los IDs de los revisores
+          y los valores son el número de revisiones que ha realizado cada usuario.
+    """
+    user_pipeline = [{"$group": {"_id": "$reviewerID", "count": {"$sum": 1}}}]
+
+    if histogram and combined_on_server(database, collection_names, use_union, use_rollups):
+        query = count_reviews(
+            database,
+            collection_names,
+            "reviewerID",
+            user_pipeline,
+            use_union,
+            use_rollups,
+            stages=[
+                {"$group": {"_id": "$count", "users": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+            allow_disk_use=allow_disk_use,
+            num_threads=num_threads,
+        )
+        return {result["_id"]: result["users"] for result in query}
+
+    reviews_by_user = defaultdict(int)
+
+    # Realizar una consulta de agregación para calcular el recuento de revisiones por usuario
+    query = count_reviews(
+        database,
+        collection_names,
+        "reviewerID",
+        user_pipeline,
+        use_union,
+        use_rollups,
+        allow_disk_use=allow_disk_use,
+        num_threads=num_threads,
+    )
+
+    # Procesar los resultados de la consulta
+    for result in query:
+        user = result["_id"]
+        count = result["count"]
+        reviews_by_user[user] += count
+
+    if not histogram:
+        return reviews_by_user
+
+    # Contar las frecuencias de los recuentos de revisiones por usuario
+    counts_histogram = defaultdict(int)
+    for count in reviews_by_user.values():
+        counts_histogram[count] += 1
+    return dict(sorted(counts_histogram.items()))
+
+
+def plot_reviews_user(counts_histogram, output_path=None):
+    """
+    Grafica el histograma del número de revisiones por usuario.
+
+    Parameters:
+        - counts_histogram: Un diccionario ordenado que contiene, para cada número de
+          revisiones, el número de usuarios que han realizado ese número de revisiones.
+        - output_path: Ruta del fichero (.png, .svg...) donde se guarda el gráfico. Si es
+          None, se muestra en pantalla.
+    """
+    # Graficar el histograma
+    plt.figure(figsize=(8, 6))
+    plt.bar(counts_histogram.keys(), counts_histogram.values())
+    plt.xticks([])
+    plt.xlabel("Número de reviews")
+    plt.ylabel("Número de usuarios")
+    plt.title("Histograma del número de reviews por usuario")
+    show_or_save(output_path)
+
+
+@cached_query
+def sixth_query(database, collection_options, use_rollups=True):
+    """
+    Consulta la base de datos para obtener la frecuencia de las palabras de los textos de las
+    reviews de una colección específica.
+
+    Si los recuentos precalculados de la colección están al día y sus palabras se han contado
+    desde la primera review, las frecuencias se leen de ellos y el coste depende solo del número
+    de palabras distintas. Si no, se leen los textos de todas las reviews y se cuentan sus palabras.
+
+    Parameters:
+        database (pymongo.database.Database): La base de datos MongoDB.
+        collection_options (str): El nombre de la colección a consultar.
+        use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+
+    Returns:
+        dict: Diccionario con la frecuencia de cada palabra.
+    """
+    if use_rollups and rollups_available(database, [collection_options], TERM_DIMENSION):
+        term_counts = {
+            result["_id"]: result["count"]
+            for result in read_rollup(database, TERM_DIMENSION, [collection_options])
+        }
+    else:
+        query = database[collection_options].find({}, {"_id": 0, "reviewText": 1})
+        term_counts = count_terms(result.get("reviewText") for result in query)
+
+    return merge_terms(term_counts)
+
+
+def create_wordcloud(term_frequencies, output_path=None):
+    """
+    Crea y muestra una nube de palabras a partir de la frecuencia de las palabras de las reviews.
+
+    Parameters:
+        term_frequencies (dict): Diccionario con la frecuencia de cada palabra.
+        output_path (str, optional): Ruta del fichero (.png, .svg...) donde se guarda el gráfico.
+            Si es None, se muestra en pantalla.
+    """
+    wordcloud = WordCloud(
+        width=800,
+        height=400,
+        background_color="white",
+        colormap="magma",
+    ).generate_from_frequencies(term_frequencies)
+
+    # Visualizamos la nube de palabras
+    plt.figure(figsize=(10, 5))
+    plt.imshow(wordcloud, interpolation="bilinear")
+    plt.axis("off")
+    show_or_save(output_path)
+
+
+@cached_query
+def seventh_query(database, collection_names, use_union=True, use_rollups=True, num_threads=query_threads):
+    """
+    Realiza una consulta a la base de datos y devuelve el recuento de revisiones por mes.
+
+    Parameters:
+        database (pymongo.database.Database): La base de datos MongoDB.
+        collection_names (list): Lista de nombres de colecciones a consultar.
+        use_union (bool): Si es True, todas las colecciones se consultan en un único pipeline.
+        use_rollups (bool): Si es True, se usan los recuentos precalculados si están al día.
+        num_threads (int): Colecciones que se consultan a la vez si no se usa '$unionWith'.
+
+    Returns:
+        dict: Diccionario con el recuento de revisiones por mes.
+    """
+
+    # Diccionario para almacenar el recuento de revisiones por mes
+    review_counts_by_month = defaultdict(int)
+
+    # Consulta de agregación para contar las revisiones por mes en todas las colecciones
+    query = count_reviews(
+        database,
+        collection_names,
+        "month",
+        [
+            {"$group": {"_id": {"$month": "$reviewTime"}, "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ],
+        use_union,
+        use_rollups,
+        num_threads=num_threads,
+    )
+
+    # Procesar los resultados de la consulta
+    for result in query:
+        month = result["_id"]
+        count = result["count"]
+        review_counts_by_month[month] += count
+
+    return review_counts_by_month
+
+
+def plot_reviews_month(reviews_counts_by_month, product_type="todos los productos", output_path=None):
+    """
+    Grafica el número de revisiones por mes.
+
+    Parameters:
+        reviews_counts_by_month (dict): Diccionario con el recuento de revisiones por mes.
+        product_type (str): Tipo de producto. Por defecto, "todos los productos".
+        output_path (str, optional): Ruta del fichero (.png, .svg...) donde se guarda el gráfico.
+            Si es None, se muestra en pantalla.
+    """
+
+    # Desempaquetar las claves (meses) y los valores (recuentos de revisiones) del diccionario
+    months, review_counts = zip(*reviews_counts_by_month.items())
+
+    # Crear el gráfico de barras
+    plt.bar(months, review_counts)
+
+    # Añadir título y etiquetas de ejes al gráfico
+    plt.title(f"Número de revisiones por mes - {product_type}")
+    plt.xlabel("Mes")
+    plt.ylabel("Número de revisiones")
+
+    # Establecer los meses como etiquetas en el eje x
+    plt.xticks(months)
+
+    # Mostrar el gráfico
+    show_or_save(output_path)
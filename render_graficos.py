@@ -0,0 +1,258 @@
+"""
+render_graficos.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Programa que genera sin ventanas todos los gráficos del menú (cada consulta con cada categoría) y
+los guarda como PNG o SVG, por ejemplo para ejecutarlo cada noche y usarlos en los informes. Los
+gráficos se generan en paralelo en varios procesos, cada uno con su propia conexión a MongoDB.
+
+En la carpeta de salida se guarda un manifiesto con las épocas y generaciones (ver
+cache_consultas.py) de las colecciones con las que se generó cada gráfico. Un gráfico solo se vuelve a generar si alguna
+de sus colecciones ha cambiado desde entonces, si falta el fichero o si se pide con --forzar.
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pymongo import MongoClient
+import queries as q
+from cache_consultas import collection_generations
+
+from configuracion import (
+    CONNECTION_STRING,
+    database_name_MongoDB,
+    collection_options,
+    charts_path,
+    chart_format,
+    render_workers,
+    popularity_top_k,
+)
+
+# Opción del menú que agrupa todas las categorías
+ALL_CATEGORIES = "Everything"
+
+# Consultas del menú
+CHART_QUERIES = range(1, 8)
+
+# Nombre del manifiesto dentro de la carpeta de salida
+MANIFEST_NAME = "manifiesto.json"
+
+# Base de datos de cada proceso, abierta en '_init_worker'
+_database = None
+
+
+def chart_collections(query, category):
+    """
+    Obtiene las colecciones que usa un gráfico.
+
+    Args:
+        query (int): Número de la consulta del menú.
+        category (str): Categoría elegida, o "Everything".
+
+    Returns:
+        list: Lista de nombres de colecciones.
+    """
+    if query == 6 or category in collection_options:
+        return [category]
+    return list(collection_options)
+
+def chart_categories(query):
+    """
+    Obtiene las categorías con las que se puede generar el gráfico de una consulta, igual que en
+    el menú: el histograma por usuario solo existe para todas las categorías y la nube de
+    palabras solo para cada categoría por separado.
+    """
+    if query == 5:
+        return [ALL_CATEGORIES]
+    if query == 6:
+        return list(collection_options)
+    return [*collection_options, ALL_CATEGORIES]
+
+def draw_chart(database, query, category=ALL_CATEGORIES, output_path=None, use_cache=True):
+    """
+    Consulta los datos de un gráfico del menú y lo muestra o lo guarda en un fichero.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        query (int): Número de la consulta del menú (de 1 a 7).
+        category (str): Categoría elegida por el usuario, o "Everything" para todas.
+        output_path (str, optional): Ruta del fichero del gráfico. Si es None, se muestra.
+        use_cache (bool): Si es True, se usa la caché de resultados de las consultas.
+
+    Returns:
+        None
+    """
+    collection_names = chart_collections(query, category)
+
+    # Título de los gráficos de una sola categoría; los de todas usan el de cada función
+    product_type = {"product_type": category} if category in collection_options else {}
+
+    if query == 1:
+        reviews_years = q.first_query(database, collection_names, use_cache=use_cache)
+        q.plot_reviews_year(reviews_years, output_path=output_path, **product_type)
+    elif query == 2:
+        # Los artículos llegan ya ordenados por recuento de revisiones de manera descendente.
+        # Con 'popularity_top_k' a None llegan todos, sin resumen del resto de la curva
+        result = q.second_query(database, collection_names, top_k=popularity_top_k, use_cache=use_cache)
+        top_asins, tail = (result, None) if popularity_top_k is None else result
+        q.plot_reviews_asin(top_asins, tail=tail, output_path=output_path, **product_type)
+    elif query == 3:
+        score_counts = q.third_query(database, collection_names, category, use_cache=use_cache)
+        q.plot_reviews_score(score_counts, output_path=output_path, **product_type)
+    elif query == 4:
+        time_stamps, cumulative_counts = q.fourth_query(database, collection_names, use_cache=use_cache)
+        q.plot_reviews_evolution(
+            time_stamps, cumulative_counts=cumulative_counts, output_path=output_path, **product_type
+        )
+    elif query == 5:
+        # El histograma se calcula en el servidor y solo llegan sus barras
+        counts_histogram = q.fifth_query(database, collection_names, use_cache=use_cache)
+        q.plot_reviews_user(counts_histogram, output_path=output_path)
+    elif query == 6:
+        term_frequencies = q.sixth_query(database, category, use_cache=use_cache)
+        q.create_wordcloud(term_frequencies, output_path=output_path)
+    elif query == 7:
+        reviews_month = q.seventh_query(database, collection_names, use_cache=use_cache)
+        q.plot_reviews_month(reviews_month, output_path=output_path, **product_type)
+    else:
+        raise ValueError(f"Consulta desconocida: {query}")
+
+def _init_worker(connection_string, database_name):
+    """
+    Prepara cada proceso: gráficos sin ventana y una conexión propia a MongoDB, ya que un
+    MongoClient no se puede compartir entre procesos.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+
+    global _database
+    _database = MongoClient(connection_string)[database_name]
+
+def _render(query, category, output_path):
+    """
+    Genera un gráfico en un proceso del grupo.
+
+    Returns:
+        float: Segundos que ha tardado.
+    """
+    start = time.perf_counter()
+    # Cada gráfico se genera una sola vez por ejecución, así que la caché no ayuda
+    draw_chart(_database, query, category, output_path, use_cache=False)
+    return time.perf_counter() - start
+
+def load_manifest(manifest_path):
+    """
+    Lee el manifiesto de la última ejecución.
+
+    Returns:
+        dict: Diccionario {fichero: [época, generación] de cada una de sus colecciones}. Vacío si
+              no existe.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as fp:
+        return json.load(fp)
+
+def write_manifest(manifest_path, manifest):
+    """
+    Escribe el manifiesto de forma atómica, para no dejarlo a medias si se interrumpe.
+    """
+    temporary_path = f"{manifest_path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=2, sort_keys=True)
+    os.replace(temporary_path, manifest_path)
+
+def render_charts(output_dir=charts_path, image_format=chart_format, num_workers=render_workers, force=False):
+    """
+    Genera todos los gráficos del menú cuyas colecciones han cambiado desde la última ejecución.
+
+    Args:
+        output_dir (str): Carpeta donde se guardan los gráficos y el manifiesto.
+        image_format (str): Formato de los ficheros ("png" o "svg").
+        num_workers (int): Número de procesos que generan gráficos a la vez.
+        force (bool): Si es True, se generan todos aunque no hayan cambiado.
+
+    Returns:
+        dict: Número de gráficos generados, sin cambios y con errores.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    # Las generaciones se leen antes de consultar: si una carga escribe mientras tanto, el
+    # gráfico se vuelve a generar en la siguiente ejecución
+    client = MongoClient(CONNECTION_STRING)
+    with client:
+        generations = dict(
+            zip(collection_options, collection_generations(client[database_name_MongoDB], collection_options))
+        )
+
+    jobs, unchanged = [], 0
+    for query in CHART_QUERIES:
+        for category in chart_categories(query):
+            file_name = f"consulta{query}_{category}.{image_format}"
+            # Listas y no tuplas, para compararlas con las que se leen del manifiesto en JSON. La
+            # época hace que tras borrar y volver a cargar la base de datos no coincidan
+            chart_generations = [list(generations[name]) for name in chart_collections(query, category)]
+
+            if not force and manifest.get(file_name) == chart_generations \
+                    and os.path.exists(os.path.join(output_dir, file_name)):
+                unchanged += 1
+                continue
+            jobs.append((query, category, file_name, chart_generations))
+
+    rendered, failed = 0, 0
+    if jobs:
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(CONNECTION_STRING, database_name_MongoDB),
+        ) as executor:
+            futures = {
+                executor.submit(_render, query, category, os.path.join(output_dir, file_name)):
+                    (file_name, chart_generations)
+                for query, category, file_name, chart_generations in jobs
+            }
+            for future in as_completed(futures):
+                file_name, chart_generations = futures[future]
+                try:
+                    seconds = future.result()
+                except Exception as error:
+                    # Sin entrada en el manifiesto, el gráfico se vuelve a intentar la próxima vez
+                    manifest.pop(file_name, None)
+                    failed += 1
+                    print(f"{file_name}: error {error!r}")
+                    continue
+
+                manifest[file_name] = chart_generations
+                rendered += 1
+                print(f"{file_name}: {seconds:.2f} s")
+
+        write_manifest(manifest_path, manifest)
+
+    print(f"Gráficos generados: {rendered}, sin cambios: {unchanged}, con errores: {failed}")
+    return {"rendered": rendered, "unchanged": unchanged, "failed": failed}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Genera sin ventanas todos los gráficos del menú.")
+    parser.add_argument("--carpeta", default=charts_path, help="Carpeta donde se guardan los gráficos.")
+    parser.add_argument("--formato", default=chart_format, choices=["png", "svg"], help="Formato de los gráficos.")
+    parser.add_argument("--procesos", type=int, default=render_workers, help="Procesos que generan gráficos a la vez.")
+    parser.add_argument(
+        "--forzar", action="store_true",
+        help="Genera todos los gráficos aunque sus colecciones no hayan cambiado.",
+    )
+    args = parser.parse_args()
+
+    render_charts(args.carpeta, args.formato, args.procesos, args.forzar)
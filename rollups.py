@@ -0,0 +1,334 @@
+"""
+rollups.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Colecciones de recuentos precalculados para las consultas del menú. Para cada categoría se guarda el
+número de reviews por año, mes, nota, ASIN y revisor, y cuántas veces aparece cada palabra en los
+textos de las reviews (para la nube de palabras). Los programas de carga los actualizan con cada lote
+que insertan, de forma que las consultas no tienen que recorrer las colecciones completas.
+
+La colección 'rollup_categories' guarda el total de reviews contadas de cada categoría. Los recuentos
+de una categoría solo se usan si ese total coincide con el número de documentos de su colección; si
+no (por ejemplo, si los datos se cargaron antes de existir estos recuentos), las consultas recorren
+la colección como antes hasta que se reconstruyen con 'rebuild_rollups'.
+
+Cada categoría guarda también en 'rollup_categories' las dimensiones que se han contado desde su
+primera review. Las categorías contadas antes de añadir una dimensión no la tienen, porque esa
+dimensión solo incluye las reviews cargadas después, y sus consultas recorren la colección.
+"""
+
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from wordcloud import STOPWORDS
+from pymongo.errors import BulkWriteError
+from escritura_mongo import DUPLICATE_KEY_ERROR
+from cache_consultas import GENERATIONS_COLLECTION
+from configuracion import database_name_MongoDB, CONNECTION_STRING
+
+# Dimensiones de los recuentos: nombre, función que obtiene la clave de un documento y
+# expresión equivalente de MongoDB para reconstruirlos
+ROLLUP_DIMENSIONS = {
+    "year": (lambda review: review["reviewTime"].year, {"$year": "$reviewTime"}),
+    "month": (lambda review: review["reviewTime"].month, {"$month": "$reviewTime"}),
+    "overall": (lambda review: review["overall"], "$overall"),
+    "asin": (lambda review: review["asin"], "$asin"),
+    "reviewerID": (lambda review: review["reviewerID"], "$reviewerID"),
+}
+
+# Dimensión con las palabras de los textos. Se separan con los mismos criterios que WordCloud:
+# sin números, sin "'s" final, sin palabras vacías y con al menos TERM_MIN_LENGTH caracteres
+TERM_DIMENSION = "term"
+TERM_MIN_LENGTH = 4
+TERM_PATTERN = re.compile(r"\w[\w']+")
+TERM_STOPWORDS = {word.lower() for word in STOPWORDS}
+
+# Todas las dimensiones, las que se guardan en 'rollup_categories' al contar una categoría desde cero
+ALL_DIMENSIONS = [*ROLLUP_DIMENSIONS, TERM_DIMENSION]
+
+# Prefijo de las colecciones de recuentos y colección con el total de cada categoría
+ROLLUP_PREFIX = "rollup_"
+ROLLUP_CATEGORIES = "rollup_categories"
+
+# Colecciones en las que ya se ha creado el índice, para no repetirlo en cada lote
+_indexed_collections = set()
+
+
+def rollup_collection_name(dimension):
+    """
+    Obtiene el nombre de la colección de recuentos de una dimensión.
+    """
+    return f"{ROLLUP_PREFIX}{dimension}"
+
+def is_rollup_collection(collection_name):
+    """
+    Indica si una colección es de recuentos y no de reviews.
+    """
+    return collection_name.startswith(ROLLUP_PREFIX)
+
+def review_collection_names(database):
+    """
+    Obtiene los nombres de las colecciones de reviews de la base de datos, sin las colecciones
+    auxiliares de los recuentos y de la caché de consultas.
+    """
+    return sorted(
+        name
+        for name in database.list_collection_names()
+        if not is_rollup_collection(name) and name != GENERATIONS_COLLECTION
+    )
+
+def review_terms(text):
+    """
+    Separa el texto de una review en las palabras que se cuentan para la nube de palabras.
+
+    Args:
+        text (str): Texto de la review.
+
+    Returns:
+        Iterable con las palabras, con sus mayúsculas originales.
+    """
+    for word in TERM_PATTERN.findall(text):
+        if word.lower().endswith("'s"):
+            word = word[:-2]
+        if word.isdigit() or len(word) < TERM_MIN_LENGTH or word.lower() in TERM_STOPWORDS:
+            continue
+        yield word
+
+def count_terms(texts):
+    """
+    Cuenta las palabras de varios textos sin unirlos en una sola cadena.
+
+    Args:
+        texts (iterable): Textos de las reviews. Los valores que no son cadenas se ignoran.
+
+    Returns:
+        Counter: Número de apariciones de cada palabra.
+    """
+    counts = Counter()
+    for text in texts:
+        if isinstance(text, str):
+            counts.update(review_terms(text))
+    return counts
+
+def merge_terms(counts):
+    """
+    Junta los recuentos de las variantes de una palabra como hace WordCloud con un texto: las
+    mayúsculas se unifican usando la forma más frecuente y los plurales terminados en "s" se
+    suman al singular si este también aparece.
+
+    Args:
+        counts (dict): Número de apariciones de cada palabra.
+
+    Returns:
+        dict: Frecuencias para 'WordCloud.generate_from_frequencies'.
+    """
+    cases = defaultdict(Counter)
+    for word, count in counts.items():
+        cases[word.lower()][word] += count
+
+    for key in list(cases):
+        if key.endswith("s") and not key.endswith("ss") and key[:-1] in cases:
+            singular = cases[key[:-1]]
+            for word, count in cases.pop(key).items():
+                singular[word[:-1]] += count
+
+    return {
+        max(case_counts.items(), key=itemgetter(1))[0]: sum(case_counts.values())
+        for case_counts in cases.values()
+    }
+
+def _ensure_index(collection):
+    """
+    Crea el índice único (categoría, clave) de una colección de recuentos si no existe.
+    """
+    if collection.full_name not in _indexed_collections:
+        collection.create_index([("category", ASCENDING), ("key", ASCENDING)], unique=True)
+        _indexed_collections.add(collection.full_name)
+
+def _increment(collection, requests):
+    """
+    Ejecuta los incrementos de un lote. Si dos hilos crean a la vez el mismo recuento, uno de los
+    dos falla por clave duplicada; esos incrementos se repiten, y la segunda vez encuentran el
+    documento ya creado.
+    """
+    try:
+        collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as error:
+        write_errors = error.details.get("writeErrors", [])
+        if not write_errors or any(write_error["code"] != DUPLICATE_KEY_ERROR for write_error in write_errors):
+            raise
+        collection.bulk_write([requests[write_error["index"]] for write_error in write_errors], ordered=False)
+
+def update_rollups(database, category, documents):
+    """
+    Suma a los recuentos de una categoría las reviews de un lote.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        category (str): Nombre de la categoría (y de su colección).
+        documents (list): Reviews insertadas.
+
+    Returns:
+        None
+    """
+    if not documents:
+        return
+
+    dimension_counts = {
+        dimension: Counter(get_key(review) for review in documents)
+        for dimension, (get_key, _) in ROLLUP_DIMENSIONS.items()
+    }
+    dimension_counts[TERM_DIMENSION] = count_terms(review.get("reviewText") for review in documents)
+
+    for dimension, counts in dimension_counts.items():
+        # Un lote sin textos no tiene palabras que sumar
+        if not counts:
+            continue
+
+        collection = database[rollup_collection_name(dimension)]
+        _ensure_index(collection)
+        _increment(
+            collection,
+            [
+                UpdateOne({"category": category, "key": key}, {"$inc": {"count": count}}, upsert=True)
+                for key, count in counts.items()
+            ],
+        )
+
+    # El total se actualiza al final: mientras no coincide con la colección no se usan los recuentos.
+    # Solo si la categoría no se había contado antes se cuentan todas las dimensiones desde cero
+    database[ROLLUP_CATEGORIES].update_one(
+        {"_id": category},
+        {"$inc": {"count": len(documents)}, "$setOnInsert": {"dimensions": ALL_DIMENSIONS}},
+        upsert=True,
+    )
+
+def record_batch(collection, documents):
+    """
+    Función para el parámetro 'after_write' de PipelinedWriter: actualiza los recuentos con las
+    reviews insertadas en una colección de categoría. Las escrituras en otras bases de datos
+    (por ejemplo la de PowerBI) no se cuentan.
+
+    Args:
+        collection (pymongo.collection.Collection): Colección en la que se ha escrito el lote.
+        documents (list): Reviews insertadas.
+
+    Returns:
+        None
+    """
+    if collection.database.name != database_name_MongoDB or is_rollup_collection(collection.name):
+        return
+    update_rollups(collection.database, collection.name, documents)
+
+def rebuild_rollups(database, category):
+    """
+    Vuelve a calcular desde cero los recuentos de una categoría recorriendo su colección.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        category (str): Nombre de la categoría.
+
+    Returns:
+        int: Número de reviews contadas.
+    """
+    database[ROLLUP_CATEGORIES].delete_one({"_id": category})
+
+    for dimension, (_, expression) in ROLLUP_DIMENSIONS.items():
+        collection = database[rollup_collection_name(dimension)]
+        _ensure_index(collection)
+        collection.delete_many({"category": category})
+
+        database[category].aggregate(
+            [
+                {"$group": {"_id": expression, "count": {"$sum": 1}}},
+                {"$project": {"_id": 0, "category": category, "key": "$_id", "count": 1}},
+                {"$merge": {"into": collection.name, "on": ["category", "key"]}},
+            ],
+            allowDiskUse=True,
+        )
+
+    # Las palabras se separan en Python, leyendo solo los textos
+    collection = database[rollup_collection_name(TERM_DIMENSION)]
+    _ensure_index(collection)
+    collection.delete_many({"category": category})
+    terms = count_terms(
+        review.get("reviewText") for review in database[category].find({}, {"_id": 0, "reviewText": 1})
+    )
+    if terms:
+        collection.insert_many(
+            ({"category": category, "key": term, "count": count} for term, count in terms.items()),
+            ordered=False,
+        )
+
+    total = database[category].count_documents({})
+    database[ROLLUP_CATEGORIES].insert_one({"_id": category, "count": total, "dimensions": ALL_DIMENSIONS})
+    return total
+
+def rollups_available(database, category_names, dimension=None):
+    """
+    Indica si los recuentos de todas las categorías están al día.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        category_names (list): Lista de nombres de categorías.
+        dimension (str, optional): Dimensión que se va a leer. Si se indica, además tiene que
+            haberse contado desde cero en todas las categorías.
+
+    Returns:
+        bool: True si el total contado de cada categoría coincide con su número de documentos.
+    """
+    categories = {
+        document["_id"]: document
+        for document in database[ROLLUP_CATEGORIES].find({"_id": {"$in": list(category_names)}})
+    }
+    return all(
+        category in categories
+        and categories[category]["count"] == database[category].estimated_document_count()
+        and (dimension is None or dimension in categories[category].get("dimensions", []))
+        for category in category_names
+    )
+
+def read_rollup(database, dimension, category_names, sort=None, stages=(), allow_disk_use=True):
+    """
+    Obtiene los recuentos de una dimensión sumados para varias categorías, con la misma forma
+    que el resultado de un '$group' sobre las colecciones de reviews.
+
+    Args:
+        database (pymongo.database.Database): Base de datos de MongoDB.
+        dimension (str): Dimensión de los recuentos ("year", "month", "overall", "asin", "reviewerID"
+            o "term").
+        category_names (list): Lista de nombres de categorías.
+        sort (dict, optional): Orden de los resultados, por ejemplo {"_id": 1}.
+        stages (list): Etapas que se aplican después en el servidor a los recuentos sumados.
+        allow_disk_use (bool): Si es True, el servidor puede usar disco temporal.
+
+    Returns:
+        Iterable con documentos {"_id": clave, "count": recuento}, o el resultado de 'stages'.
+    """
+    pipeline = [
+        {"$match": {"category": {"$in": list(category_names)}}},
+        {"$group": {"_id": "$key", "count": {"$sum": "$count"}}},
+    ]
+    if sort:
+        pipeline.append({"$sort": sort})
+    pipeline.extend(stages)
+
+    return database[rollup_collection_name(dimension)].aggregate(pipeline, allowDiskUse=allow_disk_use)
+
+
+if __name__ == "__main__":
+
+    # Reconstruye los recuentos de todas las categorías
+    client = MongoClient(CONNECTION_STRING)
+    with client:
+        database = client[database_name_MongoDB]
+        for category in review_collection_names(database):
+            print(f"{category}: {rebuild_rollups(database, category)} reviews contadas")
@@ -0,0 +1,77 @@
+"""
+secuencias.py
+
+Bases de Datos - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Integrantes del grupo:
+    - Carlos Martínez
+    - Lydia Ruiz
+
+Descripción:
+Reserva de IDs para las tablas de MySQL mediante una tabla de secuencias. Cada secuencia guarda el
+siguiente ID libre de una tabla, y un programa de carga reserva de una vez un bloque de IDs
+consecutivos con una sola actualización de esa fila. Así varias cargas pueden ejecutarse a la vez
+sin repetir IDs, y el coste de la reserva no depende del tamaño de la tabla.
+"""
+
+# Tabla con el siguiente ID libre de cada tabla
+SEQUENCES_TABLE = "Sequences"
+
+
+def ensure_sequence(cursor, table_name, first_value=1):
+    """
+    Crea la tabla de secuencias y la secuencia de una tabla si no existen. La secuencia nueva
+    empieza después del mayor ID de la tabla, que MySQL obtiene directamente de la clave primaria.
+
+    Args:
+        cursor (pymysql.cursors.Cursor): Cursor conectado a la base de datos.
+        table_name (str): Nombre de la tabla cuyos IDs se reservan.
+        first_value (int): Primer ID si la tabla está vacía.
+
+    Returns:
+        None
+    """
+    cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {SEQUENCES_TABLE}
+            (Name VARCHAR(100) NOT NULL, NextValue BIGINT NOT NULL, PRIMARY KEY (Name));"""
+    )
+    # Si dos cargas crean la secuencia a la vez, 'INSERT IGNORE' deja solo la primera
+    cursor.execute(
+        f"""INSERT IGNORE INTO {SEQUENCES_TABLE} (Name, NextValue)
+            SELECT %s, COALESCE(MAX(ID) + 1, %s) FROM {table_name};""",
+        (table_name, first_value),
+    )
+
+def reserve_ids(pool, table_name, count, first_value=1):
+    """
+    Reserva un bloque de 'count' IDs consecutivos de una tabla.
+
+    La reserva se hace en su propia transacción, con otra conexión del pool distinta de la de la
+    carga, y se confirma enseguida, de forma que el bloqueo sobre la fila de la secuencia dura solo
+    lo que tarda la actualización. Los IDs reservados no se vuelven a entregar aunque la carga que
+    los pidió falle antes de usarlos.
+
+    Args:
+        pool (ConnectionPool): Pool de conexiones de la base de datos.
+        table_name (str): Nombre de la tabla cuyos IDs se reservan.
+        count (int): Número de IDs a reservar.
+        first_value (int): Primer ID si la tabla está vacía y la secuencia no existe.
+
+    Returns:
+        int: Primer ID del bloque reservado. Los IDs van de este valor a este valor + count - 1.
+    """
+    with pool.transaction() as cursor:
+        ensure_sequence(cursor, table_name, first_value)
+
+        # LAST_INSERT_ID(expr) guarda el nuevo valor para esta conexión, sin otra consulta a la tabla
+        cursor.execute(
+            f"""UPDATE {SEQUENCES_TABLE}
+                SET NextValue = LAST_INSERT_ID(NextValue + %s)
+                WHERE Name = %s;""",
+            (count, table_name),
+        )
+        cursor.execute("SELECT LAST_INSERT_ID();")
+        (next_value,) = cursor.fetchone()
+
+    return next_value - count